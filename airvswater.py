@@ -1,22 +1,22 @@
-import thermalobject
+import integrators
+import os.path
 import sys
 
+from model import loadModel
+
 def status(msg):
 	sys.stdout.write('\x1b[2K\x1b[80D')
 	sys.stdout.write('\x1b[1D')
 	sys.stdout.write(msg)
 	#sys.stdout.flush()
 
-water_d = (6.096, 0.6096, 0.0762)
-soil_d = (6.096, 3.048, 2.4384)
-air_d = (6.096, 3.048, 2.4384)
-
-radiator_d = (0.681, 0.6048, 0.2016)
+model = loadModel(os.path.join(os.path.dirname(os.path.abspath(__file__)), "airvswater.json"))
+bodies = model.objects()
 
-water = thermalobject.Water(water_d)
-soil = thermalobject.Soil(soil_d)
-air = thermalobject.Air(air_d, 40)
-radiator = thermalobject.Aluminum(radiator_d)
+water = bodies["water"]
+soil = bodies["soil"]
+air = bodies["air"]
+radiator = bodies["radiator"]
 
 
 print("starting energy:")
@@ -26,16 +26,12 @@ print("air: ", air.energy)
 
 
 def airToSoil(air, soil):
-	seconds = 0
 
 	print("")
 	print("transfering air to soil...")
 
-	while round(soil.temperature,0) < round(air.temperature,0) - 1:
-
-		air.transferTo(soil)
-		#status("air energy: {}, air temp {}, soil energy: {}, soil temp: {}".format(air.energy, air.temperature, soil.energy, soil.temperature))
-		seconds += 1
+	"two bodies exchanging by conduction have a closed form, no need to step"
+	seconds = air.timeToGap(soil, 1)
 
 	print("time to transfer air energy to soil: {}hrs".format(seconds/3600.0))
 
@@ -50,14 +46,17 @@ def airToWater(air, water, soil):
 	print("")
 	print("transfering air to water...")
 
-	while round(water.temperature, 0) < round(air.temperature, 0) - 1:
+	"four bodies have no closed form, so step them as a network with an adaptive integrator and check every minute"
+	network = model.network(objects={"air" : air, "radiator" : radiator, "soil" : soil, "water" : water})
+
+	integrator = integrators.Adaptive()
+
+	while round(network.getTemperature("water")[0], 0) < round(network.getTemperature("air")[0], 0) - 1:
+
+		network.advance(60, lambda t: (0, None), integrator)
+		seconds += 60
 
-		air.transferTo(radiator)
-		air.transferTo(soil)
-		soil.transferTo(water)
-		air.transferTo(radiator)
-		radiator.transferTo(water)
-		seconds += 1
+	network.writeBack()
 
 	print("time to transfer air energy to water: {}hrs".format(seconds/3600.0))
 
@@ -66,7 +65,7 @@ from multiprocessing import Process
 
 a = Process(target=airToSoil, args=(air, soil))
 
-air = thermalobject.Air(air_d, 40)
+air = model.objects()["air"]
 
 b = Process(target=airToWater, args=(air, water, soil))
 
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+"""
+	benchmarks
+
+	Times the thermal primitives and whole simulated days, weeks and tube sizings
+	with the solar and weather layer replaced by a fixed synthetic day, so the
+	numbers only measure the simulation and the suite runs offline.  Every run is
+	appended to a JSON-lines history and compared with the previous results, so a drop
+	in steps per second shows up from one change to the next.
+"""
+from datetime import datetime
+import contextlib
+import io
+import json
+import math
+import os.path
+import platform
+import subprocess
+import time
+
+import thermalobject
+from thermalobject import Water, Soil, Air, ThermalConstants
+
+def stubDailyInputs(date, minuteConditions, minAirTemp, maxAirTemp, latitude=45.542384, longitude=-122.961576, weather=None):
+	"the same clear day every day: sunshine from 6am to 6pm peaking at 1000W/m^2 and outside air swinging between 2 and 12C"
+
+	if not hasattr(stubDailyInputs, "day"):
+		solarPower = [max(0.0, 1000 * math.sin(math.pi * (second - 6 * 3600) / (12 * 3600))) if 6 * 3600 <= second < 18 * 3600 else 0.0 for second in range(86400)]
+		outsideAirTemp = [7 - 5 * math.cos(2 * math.pi * (second - 3 * 3600) / 86400) for second in range(86400)]
+		stubDailyInputs.day = solarPower, outsideAirTemp, ["Clear"] * 86400
+
+	return stubDailyInputs.day
+
+def stubWeatherDay(date):
+	return 2, 12, [None] * 1440
+
+@contextlib.contextmanager
+def offline():
+	"swap geothermal's solar and weather layer for stubs, and swallow its day by day printing"
+	import geothermal
+
+	saved = geothermal.dailyInputs, geothermal.weatherDay, geothermal.prefetchWeather
+	geothermal.dailyInputs = stubDailyInputs
+	geothermal.weatherDay = stubWeatherDay
+	geothermal.prefetchWeather = lambda year, days=364: None
+
+	try:
+		with contextlib.redirect_stdout(io.StringIO()):
+			yield geothermal
+	finally:
+		geothermal.dailyInputs, geothermal.weatherDay, geothermal.prefetchWeather = saved
+
+def timed(function, steps, repeat=3):
+	"best of repeat runs of function, which performs steps steps.  returns (seconds, steps per second)"
+
+	best = None
+
+	for r in range(repeat):
+		start = time.perf_counter()
+		function()
+		elapsed = time.perf_counter() - start
+
+		if best is None or elapsed < best:
+			best = elapsed
+
+	return best, steps / best
+
+def benchTransferTo(steps):
+	water = Water(mass = 0.20819755 * ThermalConstants.Density.water, temperature = 20)
+	soil = Soil(mass = 424753, temperature = 10)
+
+	def run():
+		for i in range(steps):
+			water.transferTo(soil, 1.5, length=0.22)
+
+	return run
+
+def benchTransferToConvection(steps):
+	soil = Soil(mass = 424753, temperature = 20)
+	air = Air(mass = 24.5 * ThermalConstants.Density.air, temperature = 10)
+
+	def run():
+		for i in range(steps):
+			soil.transferTo(air, 1.67, convection=True)
+
+	return run
+
+def benchRadiate(steps):
+	soil = Soil(mass = 424753, temperature = 15)
+
+	def run():
+		for i in range(steps):
+			soil.radiate(1.67)
+
+	return run
+
+def benchConvectionEnergyTransfer(steps):
+	convectionEnergyTransfer = thermalobject.convectionEnergyTransfer
+
+	def run():
+		for i in range(steps):
+			convectionEnergyTransfer(1.67, 12.5, 15)
+
+	return run
+
+"the greenhouse geothermal.py simulates from its command line"
+soilBank = {
+	"waterMass" : 0.20819755 * ThermalConstants.Density.water,
+	"waterSurfaceArea" : 0.74322432,
+	"soilBedMass" : 424753,
+	"soilBedSurfaceArea" : 3.6576 * 0.4572,
+	"minimumTemperature" : 0,
+	"greenhouseDimensions" : (4.8768, 1.8288, 2.7432)
+}
+
+def benchSoilBank(days, engine="objects"):
+	"findSoilBankArea over days simulated days; its first soil bank mass survives them, so this is a single pass"
+
+	def run():
+		with offline() as geothermal:
+			geothermal.findSoilBankArea(engine=engine, days=days, **soilBank)
+
+	return run
+
+def benchCoolingLoop(energyToSink=1000):
+	from tube_length_calc import cooling_loop
+
+	def run():
+		transferMedium = Water(mass=1, temperature=thermalobject.c_to_kelvin(32))
+
+		with contextlib.redirect_stdout(io.StringIO()):
+			cooling_loop(transferMedium, energyToSink, 100000, 0.0127, thermalobject.c_to_kelvin(15), 0.22)
+
+	return run
+
+"the candidate soil bank masses findSoilBankAreaArray steps together; they all survive the synthetic days"
+arrayRuns = 16
+
+def suite(quick=False):
+	"""(name, function, steps) for every benchmark; steps are calls, or simulated seconds for the simulations.
+	the array engine steps arrayRuns masses every second, so its steps are simulated seconds of one mass, as the objects engine's are"""
+
+	calls = 20000 if quick else 200000
+
+	benchmarks = [
+		("transferTo", benchTransferTo(calls), calls),
+		("transferTo convection", benchTransferToConvection(calls), calls),
+		("radiate", benchRadiate(calls), calls),
+		("convectionEnergyTransfer", benchConvectionEnergyTransfer(calls), calls),
+		("findSoilBankArea day", benchSoilBank(1), 86400),
+		("findSoilBankArea day array", benchSoilBank(1, "array"), arrayRuns * 86400)
+	]
+
+	if not quick:
+		benchmarks.append(("findSoilBankArea week", benchSoilBank(7), 7 * 86400))
+		benchmarks.append(("findSoilBankArea week array", benchSoilBank(7, "array"), arrayRuns * 7 * 86400))
+
+	benchmarks.append(("cooling_loop", benchCoolingLoop(), 1))
+
+	return benchmarks
+
+def revision():
+	try:
+		return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def loadHistory(history):
+	runs = []
+
+	if os.path.isfile(history):
+		with open(history, "r") as f:
+			for line in f:
+				try:
+					runs.append(json.loads(line))
+				except ValueError:
+					continue
+
+	return runs
+
+def run(history="benchmarks.jsonl", quick=False, repeat=3, only=None, threshold=0.1):
+	"""run the suite, append the results to history and print them next to the previous results.
+	returns the names of benchmarks whose steps per second dropped by more than threshold"""
+
+	"""the latest result of each benchmark from runs of the same size on this machine, so runs of a few benchmarks
+	with --only don't hide the others and --quick runs or other machines are not compared"""
+	previous = {}
+	for entry in loadHistory(history):
+		if entry.get("quick", False) == quick and entry.get("machine") == platform.node():
+			previous.update(entry["results"])
+
+	results = {}
+	regressions = []
+
+	for name, function, steps in suite(quick):
+		if only and only not in name:
+			continue
+
+		seconds, rate = timed(function, steps, 1 if steps >= 86400 else repeat)
+		results[name] = {"seconds" : seconds, "steps" : steps, "steps_per_second" : rate}
+
+		change = ""
+		"a benchmark whose steps changed counts something else now"
+		if name in previous and previous[name]["steps"] == steps:
+			ratio = rate / previous[name]["steps_per_second"] - 1
+			change = "{:+.1%}".format(ratio)
+
+			if ratio < -threshold:
+				regressions.append(name)
+				change += "  REGRESSION"
+
+		print("{:<30} {:>14.1f} steps/s {:>10.4f}s  {}".format(name, rate, seconds, change))
+
+	with open(history, "a") as f:
+		f.write(json.dumps({
+			"date" : datetime.now().isoformat(),
+			"revision" : revision(),
+			"python" : platform.python_version(),
+			"machine" : platform.node(),
+			"quick" : quick,
+			"results" : results
+		}) + "\n")
+
+	return regressions
+
+if __name__ == "__main__":
+
+	import argparse
+	import sys
+
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--history", help="json-lines file results are appended to and compared against", default="benchmarks.jsonl", type=str)
+	parser.add_argument("--quick", help="fewer calls and no week long simulations", action="store_true")
+	parser.add_argument("--repeat", help="runs of each micro benchmark; the best is kept", default=3, type=int)
+	parser.add_argument("--only", help="only run benchmarks whose name contains this", default=None, type=str)
+	parser.add_argument("--threshold", help="fractional drop in steps per second reported as a regression", default=0.1, type=float)
+	args = parser.parse_args()
+
+	if run(args.history, args.quick, args.repeat, args.only, args.threshold):
+		sys.exit(1)
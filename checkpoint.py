@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+"""
+	checkpoints
+
+	Snapshots of a running findSoilBankArea: the parameters it was called with
+	(a Model passed as model is stored as what builds it), the simulated date
+	and day, the search state (soil bank masses tried so far) and every body's
+	temperature, written as small JSON files every few simulated days, along
+	with the environment of the run (the weather provider and input workers).  resume() continues a run from any of them; resume()
+	with changed parameters forks a what-if branch from it instead.
+"""
+import json
+import os.path
+
+class Checkpoints(object):
+	"writes a checkpoint every 'every' simulated days into directory"
+
+	def __init__(self, directory, every=7, parameters=None, environment=None):
+		"""parameters are the findSoilBankArea arguments of the run, environment the geothermal module settings
+		it ran with (see geothermal.configure)"""
+		object.__init__(self)
+
+		self.directory = directory
+		self.every = every
+		self.parameters = parameters or {}
+		self.environment = environment or {}
+
+		os.makedirs(directory, exist_ok=True)
+
+	def due(self, day):
+		return day % self.every == 0
+
+	def save(self, name, state):
+		"write state (plus the run's parameters) as directory/name.json.  returns the filename"
+
+		state = dict(state)
+		state["parameters"] = self.parameters
+		state["environment"] = self.environment
+
+		filename = os.path.join(self.directory, name + ".json")
+
+		with open(filename + ".partial", "w") as f:
+			f.write(json.dumps(state))
+
+		os.replace(filename + ".partial", filename)
+
+		return filename
+
+def loadCheckpoint(filename):
+	with open(filename, "r") as f:
+		return json.loads(f.read())
+
+def describeIntegrator(integrator):
+	"[class name, arguments] of an integrators module integrator, to store in a checkpoint"
+	import integrators
+
+	if integrator is None:
+		return None
+
+	if isinstance(integrator, integrators.Adaptive):
+		return ["Adaptive", {"tolerance" : integrator.tolerance, "step" : integrator.initialStep, "minStep" : integrator.minStep, "maxStep" : integrator.maxStep}]
+
+	return [type(integrator).__name__, {"step" : integrator.initialStep}]
+
+def buildIntegrator(description):
+	import integrators
+
+	if description is None:
+		return None
+
+	name, arguments = description
+	return getattr(integrators, name)(**arguments)
+
+def describeModel(model):
+	"""a findSoilBankArea model to store in a checkpoint: a file name as it is and a Model as what builds it again,
+	so a continued run uses the same model and not the default"""
+
+	if model is None or isinstance(model, str):
+		return model
+
+	description = {"definition" : model.definition, "config" : model.config, "overrides" : model.overrides, "directory" : model.directory}
+
+	try:
+		json.dumps(description)
+	except TypeError:
+		raise Exception("error: a model whose definition is not plain JSON cannot be checkpointed; load it from a model file")
+
+	return description
+
+def buildModel(description):
+	from model import Model
+
+	if isinstance(description, dict):
+		return Model(**description)
+
+	return description
+
+def resume(filename, environment=None, **changes):
+	"""continue the findSoilBankArea run a checkpoint was taken from, with the weather provider and workers it ran with.
+	changes replace any of the run's findSoilBankArea arguments, which forks a what-if branch from the checkpoint instead;
+	environment replaces any of the geothermal.configure settings"""
+	import geothermal
+
+	state = loadCheckpoint(filename)
+
+	parameters = dict(state["parameters"])
+	parameters["integrator"] = buildIntegrator(parameters["integrator"])
+	parameters["model"] = buildModel(parameters.get("model"))
+	parameters.update(changes)
+
+	if parameters.get("engine", "objects") != state["engine"]:
+		raise Exception("error: {} was taken by the {} engine and can only be continued with it, not the {} engine".format(filename, state["engine"], parameters.get("engine", "objects")))
+
+	settings = dict(state.get("environment", {}))
+	settings.update(environment or {})
+	geothermal.configure(**settings)
+
+	return geothermal.findSoilBankArea(resume=state, **parameters)
+
+if __name__ == "__main__":
+
+	import argparse
+
+	parser = argparse.ArgumentParser()
+	parser.add_argument("checkpoint", help="checkpoint file to continue from", type=str)
+	parser.add_argument("--set", help="parameter=value to fork with a different findSoilBankArea argument; may be repeated", action="append", default=[])
+	parser.add_argument("--checkpoint-dir", help="directory for the checkpoints of the continued run", default=None, type=str)
+	parser.add_argument("--weather", help="weather provider (see geothermal.py --weather); the checkpoint's by default", default=None, type=str)
+	parser.add_argument("--workers", help="input worker processes (see geothermal.py --workers); the checkpoint's by default", default=None, type=int)
+	parser.add_argument("--ui", help="where to send progress frames: pyotherside, stdout, socket:HOST:PORT or none", default=None, type=str)
+	parser.add_argument("--ui-interval", help="wall clock seconds between progress frames", default=0.1, type=float)
+	parser.add_argument("--profile", help="time the phases of the simulation and report every this many wall clock seconds", default=None, type=float)
+	parser.add_argument("--profile-days", help="FIRST:LAST simulated days to run cProfile over", default=None, type=str)
+	parser.add_argument("--profile-dump", help="pstats file for --profile-days", default="profile.pstats", type=str)
+	args = parser.parse_args()
+
+	changes = {}
+
+	for setting in args.set:
+		name, value = setting.split("=", 1)
+		changes[name] = json.loads(value)
+
+	if args.checkpoint_dir:
+		changes["checkpoint"] = args.checkpoint_dir
+
+	environment = {"ui" : args.ui, "uiInterval" : args.ui_interval, "profile" : args.profile, "profileDays" : args.profile_days, "profileDump" : args.profile_dump}
+
+	if args.weather:
+		environment["weather"] = args.weather
+	if args.workers is not None:
+		environment["workers"] = args.workers
+
+	resume(args.checkpoint, environment, **changes)
+
+	import geothermal
+
+	if geothermal.profiler:
+		geothermal.profiler.close()
@@ -0,0 +1,115 @@
+"""
+	day pipeline
+
+	Prepares the per second inputs of simulated days (solar power, outside air
+	temperature and weather condition, as geothermal.dayInputs computes them)
+	ahead of the simulation.  Worker processes compute the next days while the
+	simulation steps the current one; at most 'depth' days are in flight, so
+	memory stays bounded however fast the workers are.  Days come out in
+	order.  With no workers every day is computed when it is asked for.
+
+	Workers are forked from the simulating process, so they see its weather
+	provider and anything else set up before the pipeline was created.  The
+	first day of every year the run covers is computed in the simulating
+	process before forking, so the caches those days build (the year's solar
+	table, the weather store) are built once and inherited, instead of by
+	every worker at once.  The time workers spend on each day is passed to
+	prepared(), which the profiler counts.
+"""
+import collections
+import multiprocessing
+import multiprocessing.pool
+import time
+from datetime import timedelta
+
+"the inputs function and weather timeline of the pipeline a worker serves"
+worker = None
+
+def initializeWorker(inputs, weather):
+	global worker
+	worker = (inputs, weather)
+
+def prepareDay(date):
+	"the inputs of date and the seconds the worker took over them"
+	inputs, weather = worker
+	start = time.perf_counter()
+	return inputs(date, weather), time.perf_counter() - start
+
+class DayPipeline(object):
+
+	def __init__(self, inputs, start, days, weather=None, workers=0, depth=None):
+		"""inputs(date, weather) for days days starting at the datetime start.  weather is a weather timeline (see weatherTimeline)
+		or None for the daily weather.  depth is the largest number of days prepared ahead (twice the workers by default)"""
+		object.__init__(self)
+
+		self.inputs = inputs
+		self.dates = [start + timedelta(days=day) for day in range(days)]
+		self.weather = weather
+		self.workers = workers
+		self.depth = depth or 2 * workers
+
+		self.submitted = 0
+		self.pending = collections.deque()
+		self.pool = None
+
+		"inputs of days computed here, by index"
+		self.ready = {}
+
+		if workers:
+			for i, date in enumerate(self.dates):
+				if i == 0 or date.year != self.dates[i - 1].year:
+					self.ready[i] = inputs(date, weather)
+
+			self.pool = multiprocessing.get_context("fork").Pool(workers, initializeWorker, (inputs, weather))
+			self.fill()
+
+	def fill(self):
+		while len(self.pending) < self.depth and self.submitted < len(self.dates):
+			if self.submitted in self.ready:
+				self.pending.append(self.ready.pop(self.submitted))
+			else:
+				self.pending.append(self.pool.apply_async(prepareDay, (self.dates[self.submitted],)))
+			self.submitted += 1
+
+	def next(self):
+		"(solarPower, outsideAirTemp, conditions) of the next day"
+
+		if not self.pool:
+			if self.submitted == len(self.dates):
+				raise Exception("error: the day pipeline has no days left")
+
+			date = self.dates[self.submitted]
+			self.submitted += 1
+			return self.inputs(date, self.weather)
+
+		if not self.pending:
+			raise Exception("error: the day pipeline has no days left")
+
+		inputs = self.pending.popleft()
+		if isinstance(inputs, multiprocessing.pool.AsyncResult):
+			inputs, seconds = inputs.get()
+			self.prepared(seconds)
+		self.fill()
+
+		return inputs
+
+	def prepared(self, seconds):
+		"called with the seconds a worker spent on every day it prepared (for the profiler: that time is not spent here)"
+		pass
+
+	def close(self):
+		"stop the workers, discarding days prepared but not used (the simulation failed early)"
+
+		if self.pool:
+			self.pool.terminate()
+			self.pool.join()
+			self.pool = None
+
+		self.pending.clear()
+		self.ready.clear()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exception):
+		self.close()
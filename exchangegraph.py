@@ -0,0 +1,136 @@
+"""
+	exchange graph
+
+	The exchanges of a set of ThermalObjects (solar absorption, transferTo
+	between pairs, radiation with part of it returned) frozen into a flat list
+	of terms.  Contact areas, conductances for either direction of flow,
+	radiation coefficients and thermal masses are worked out once by compile(),
+	so a step is the arithmetic transferTo and radiate would do, applied
+	straight to the objects' temperatures in the order the exchanges were
+	added.  The results are the same, to the bit, as calling transferTo and
+	radiate in that order, including transferTo's use of the cooler body's
+	conductivity and its push of energy into self when both bodies have the
+	same conductivity.
+"""
+import math
+
+from thermalobject import convectionEnergyTransfer
+
+STEFAN_BOLTZMANN = 5.67 * math.pow(10, -8)
+
+class ExchangeGraph(object):
+
+	def __init__(self):
+		object.__init__(self)
+
+		self.bodies = {}
+		self.fixed = set()
+
+		self._absorbers = []
+		self._links = []
+		self._radiators = []
+
+		self.compiled = False
+
+	def addBody(self, name, thermalObject, fixed=False):
+		"""add a body.  fixed bodies are boundary conditions whose temperature is set from outside the graph
+		(they still take part in exchanges, as with transferTo, but their thermal mass should make that negligible)"""
+
+		self.bodies[name] = thermalObject
+
+		if fixed:
+			self.fixed.add(name)
+
+		self.compiled = False
+
+	def absorb(self, name, area, efficiency=1):
+		"solar power (W/m^2) falling on name is absorbed over area with efficiency"
+
+		self._absorbers.append((name, area, efficiency))
+		self.compiled = False
+
+	def couple(self, a, b, contactArea=None, length=1, convection=False):
+		"equivalent of a.transferTo(b, contactArea, length=length, convection=convection) every step"
+
+		self._links.append((a, b, contactArea, length, convection))
+		self.compiled = False
+
+	def radiate(self, name, contactArea=None, returned=0):
+		"equivalent of name.radiate(contactArea) every step, with a fraction 'returned' of the radiated energy added back"
+
+		self._radiators.append((name, contactArea, returned))
+		self.compiled = False
+
+	def compile(self):
+		"""freeze the exchanges into terms.  masses, conductivities and dimensions are read now, so compile again
+		after changing any of them (temperatures are read every step)"""
+
+		self.absorbers = []
+		self.links = []
+		self.radiators = []
+
+		for name, area, efficiency in self._absorbers:
+			body = self.bodies[name]
+			self.absorbers.append((body, area, efficiency, body.thermalMass))
+
+		for a, b, contactArea, length, convection in self._links:
+			a = self.bodies[a]
+			b = self.bodies[b]
+
+			if not contactArea:
+				contactArea = a.estimateContactArea(b)
+
+			"""conductance numerators (k * area) for a cooler than b (a's conductivity) and for a at least as warm as b
+			(b's conductivity), and whether equal conductivities send the energy into a"""
+			self.links.append((a, b, a.conductivity * contactArea, b.conductivity * contactArea, length, convection, contactArea, a.conductivity == b.conductivity, a.thermalMass, b.thermalMass))
+
+		for name, contactArea, returned in self._radiators:
+			body = self.bodies[name]
+
+			if not contactArea:
+				contactArea = body.estimateContactArea()
+
+			self.radiators.append((body, body.emissivity * STEFAN_BOLTZMANN * contactArea, returned, body.thermalMass))
+
+		self.compiled = True
+
+	def step(self, solarPower=0):
+		"one second of absorbing solarPower, exchanging and radiating"
+
+		if not self.compiled:
+			self.compile()
+
+		self.exchange(solarPower)
+		self.radiation()
+
+	def exchange(self, solarPower):
+		"the absorbing and exchanging part of step (separate so the two can be timed apart)"
+
+		for body, area, efficiency, thermalMass in self.absorbers:
+			body.temperature = (thermalMass * body.temperature + solarPower * area * efficiency) / thermalMass
+
+		for a, b, cold, hot, length, convection, contactArea, equal, massA, massB in self.links:
+			ta = a.temperature
+			tb = b.temperature
+
+			if convection:
+				et = convectionEnergyTransfer(contactArea, tb, ta)
+			elif ta < tb:
+				et = cold * (ta - tb) / length
+			else:
+				et = hot * (tb - ta) / length
+
+			if ta < tb or equal:
+				a.temperature = (massA * ta - et) / massA
+				b.temperature = (massB * tb + et) / massB
+			else:
+				b.temperature = (massB * tb - et) / massB
+				a.temperature = (massA * ta + et) / massA
+
+	def radiation(self):
+		"the radiating part of step"
+
+		for body, coefficient, returned, thermalMass in self.radiators:
+			radiation = coefficient * (body.temperature ** 4)
+			body.temperature = (thermalMass * body.temperature - radiation) / thermalMass
+			body.temperature = (thermalMass * body.temperature + radiation * returned) / thermalMass
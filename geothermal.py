@@ -20,13 +20,13 @@ TempFinal = Q / mc
 from astral import Location
 from datetime import datetime, timedelta
 from thermalobject import *
+from model import loadModel
 
 import math
 import time as tm
 import os.path
 
 import json
-from urllib.request import urlopen
 
 import pdb
 
@@ -43,12 +43,68 @@ except:
 
 	hasOtherSide = False
 
+"""batched, throttled updates for a front-end (see the uichannel module): the QML front-end when running
+in pyotherside, otherwise whatever --ui picks"""
+ui = None
+
+if hasOtherSide:
+	from uichannel import channel
+	ui = channel("pyotherside")
+
+"a profiling.Profiler when profiling (see --profile)"
+profiler = None
+
+"processes preparing the inputs of the next days while a day is simulated (see the daypipeline module); 0 computes each day when it starts"
+workers = 0
+
 def debugOut(msg):
 	if hasOtherSide:
 		pyotherside.send("debug", msg)
 	else:
 		print(msg)
 
+"where days missing from the weather/ cache come from; see the weatherproviders module"
+weatherProvider = None
+
+"the --weather name weatherProvider was made from, kept in checkpoints so a continued run uses it too"
+weatherSource = None
+
+def configure(weather=None, workers=0, ui=None, uiInterval=0.1, profile=None, profileDays=None, profileDump="profile.pstats"):
+	"""set up the module the way the command line options do: the weather provider by --weather name, the input workers,
+	the ui channel by --ui name and profiling (every profile wall clock seconds and cProfile over the days FIRST:LAST)"""
+	global weatherProvider, weatherSource, profiler
+	module = sys.modules[__name__]
+
+	if weather:
+		import weatherproviders
+		weatherProvider = weatherproviders.provider(weather)
+		weatherSource = weather
+
+	module.workers = workers
+
+	if ui:
+		import uichannel
+		module.ui = uichannel.channel(ui, uiInterval)
+
+	if profile is not None or profileDays:
+		import profiling
+
+		window = None
+		if profileDays:
+			window = tuple(int(day) for day in profileDays.split(":"))
+
+		profiler = profiling.Profiler(profile or None, window, profileDump)
+		profiler.install(module)
+
+def getWeatherProvider():
+	global weatherProvider
+
+	if weatherProvider is None:
+		from weatherproviders import WundergroundProvider
+		weatherProvider = WundergroundProvider()
+
+	return weatherProvider
+
 def wuGetAirTemperature(date):
 
 	"first try to see if we have a cached file for this day:"
@@ -59,9 +115,7 @@ def wuGetAirTemperature(date):
 		with open(filename, "r") as f:
 			result = f.read()
 	else:
-		'''http://api.wunderground.com/api/Your_Key/history_YYYYMMDD/q/OR/Hillsboro.json'''
-		f = urlopen('http://api.wunderground.com/api/cbd714e056969068/history_{0}/q/OR/Hillsboro.json'.format(date.strftime("%Y%m%d")))
-		result = f.read().decode('utf-8')
+		result = json.dumps(getWeatherProvider().history(date))
 
 		with open(filename, "w") as f:
 			f.write(result)
@@ -76,6 +130,14 @@ def wuGetAirTemperature(date):
 
 	return mintemp, maxtemp, observations
 
+def prefetchWeather(year, days=364):
+	"fetch every day of a run missing from the cache in one go and ingest them, so the run never waits on the weather provider"
+	from weatherproviders import prefetch
+	from weatherstore import weatherStore
+
+	if prefetch(getWeatherProvider(), datetime(year, 1, 1), days):
+		weatherStore().ingest()
+
 def weatherGetConditions(date, observations):
 	for observation in observations:
 		h = observation["date"]["hour"]
@@ -86,6 +148,31 @@ def weatherGetConditions(date, observations):
 
 	return None
 
+def weatherDay(date):
+	"""daily min and max air temperature and the condition reported in every minute of the day, from the weather store.
+	days missing from the store are fetched into the cache with wuGetAirTemperature and ingested"""
+	from weatherstore import weatherStore
+
+	store = weatherStore()
+
+	if not store.hasDay(date):
+		wuGetAirTemperature(date)
+		store.ingest()
+
+	minAirTemp, maxAirTemp, meanAirTemp = store.daily(date)
+
+	return minAirTemp, maxAirTemp, store.conditionsByMinute(date)
+
+def weatherTimeline(year, days=364):
+	"""outside air temperature and cloud attenuation for a whole run, interpolated between observations.
+	fetches any missing days first so the run never waits on the network"""
+	from weatherstore import weatherStore
+	from weathertimeline import WeatherTimeline
+
+	prefetchWeather(year, days)
+
+	return WeatherTimeline(weatherStore(), datetime(year, 1, 1), days * 86400, getRadiationVisibilityCoefficient)
+
 def getRadiationVisibilityCoefficient(condition):
 	if condition == "Fog":
 		return 0.1
@@ -98,6 +185,60 @@ def getRadiationVisibilityCoefficient(condition):
 
 	return 1.0
 
+def dailyInputs(date, minuteConditions, minAirTemp, maxAirTemp, latitude=45.542384, longitude=-122.961576, weather=None):
+	"""per second solar power (W/m^2), outside air temperature and weather condition for the day starting at date,
+	given the condition observed in each minute of the day (see weatherDay).
+	conditions persist until the next observation and the outside air flips to the daily max while the sun is strong.
+	with a weather timeline (see weatherTimeline) the day is sliced from it instead"""
+	from solartable import solarWindow
+
+	solarAlt, solarRadiation = solarWindow(latitude, longitude, date, 86400)
+
+	if weather:
+		outsideAirTemp, attenuation, conditions = weather.window(date, 86400)
+		return (solarRadiation * attenuation).tolist(), outsideAirTemp.tolist(), conditions.tolist()
+	solarAlt = solarAlt.tolist()
+	solarRadiation = solarRadiation.tolist()
+
+	solarPower = []
+	outsideAirTemp = []
+	conditions = []
+
+	condition = "Clear"
+	airTemp = float(minAirTemp)
+
+	for second in range(86400):
+		power = 0
+
+		cond = minuteConditions[second // 60]
+
+		if cond:
+			condition = cond
+
+		if solarAlt[second] > 0:
+			power = solarRadiation[second]
+			"factor in clouds "
+			power = power * getRadiationVisibilityCoefficient(condition)
+			if power >= 1:
+				airTemp = float(maxAirTemp)
+			else:
+				airTemp = float(minAirTemp)
+
+		solarPower.append(power)
+		outsideAirTemp.append(airTemp)
+		conditions.append(condition)
+
+	return solarPower, outsideAirTemp, conditions
+
+def dayInputs(date, weather=None):
+	"the day's solar power, outside air temperature and conditions from the weather timeline, or else from the day's weather"
+
+	if weather:
+		return dailyInputs(date, None, None, None, weather=weather)
+
+	minAirTemp, maxAirTemp, minuteConditions = weatherDay(date)
+	return dailyInputs(date, minuteConditions, minAirTemp, maxAirTemp)
+
 def calculateGreenhouseEffect(energyIn, soilTemp, airTemp, outsideAirTemp, greenhouseDimensions, surfaceAbsorbtionRate=0.80, glassReflectionRate=0.90):
 
 	surfaceArea = greenhouseDimensions[0] * greenhouseDimensions[1]
@@ -135,184 +276,498 @@ def calculateGreenhouseEffect(energyIn, soilTemp, airTemp, outsideAirTemp, green
 
 	return soilTemp, airTemp
 
+soilBankModelFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), "soilbank.json")
+soilBankModels = {}
+
+def soilBankModel(model=None):
+	"the model the soil bank simulations compile: a Model, a model or greenhouse file, or soilbank.json by default"
+
+	if model is None:
+		model = soilBankModelFile
+
+	if isinstance(model, str):
+		if model not in soilBankModels:
+			soilBankModels[model] = loadModel(model)
+		return soilBankModels[model]
+
+	return model
+
+def soilBankNetwork(soilBankMasses, waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea, greenhouseDimensions, startingTemperature, surfaceAreaPex, solar_efficiency, greenhouse_effect, insulationThickness, model=None):
+	"""the findSoilBankArea exchange loop as a ThermalNetwork, with one run per candidate soil bank mass.
+	the bodies and couplings come from model (see soilBankModel), the values from the arguments"""
+	import numpy as np
+
+	soilBankMasses = np.asarray(soilBankMasses, dtype=float)
+
+	return soilBankModel(model).network(len(soilBankMasses), soilBankMass = soilBankMasses, **soilBankParameters(waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea, greenhouseDimensions, startingTemperature, surfaceAreaPex, solar_efficiency, greenhouse_effect, insulationThickness))
+
+def soilBankGraph(soilBankMass, waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea, greenhouseDimensions, startingTemperature, surfaceAreaPex, solar_efficiency, greenhouse_effect, insulationThickness, model=None):
+	"""the findSoilBankArea exchange loop for one soil bank mass as an ExchangeGraph over ThermalObjects,
+	with every contact area and conductance worked out once"""
+
+	return soilBankModel(model).exchangeGraph(soilBankMass = soilBankMass, **soilBankParameters(waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea, greenhouseDimensions, startingTemperature, surfaceAreaPex, solar_efficiency, greenhouse_effect, insulationThickness))
+
+def soilBankParameters(waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea, greenhouseDimensions, startingTemperature, surfaceAreaPex, solar_efficiency, greenhouse_effect, insulationThickness):
+	"the soil bank model's parameters from findSoilBankArea's arguments"
+
+	return {
+		"waterMass" : waterMass,
+		"waterSurfaceArea" : waterSurfaceArea,
+		"soilBedMass" : soilBedMass,
+		"soilBedSurfaceArea" : soilBedSurfaceArea,
+		"greenhouseDimensions" : greenhouseDimensions,
+		"startingTemperature" : startingTemperature,
+		"surfaceAreaPex" : surfaceAreaPex,
+		"solarEfficiency" : solar_efficiency,
+		"greenhouseEffect" : greenhouse_effect,
+		"insulationThickness" : insulationThickness
+	}
+
+def simulateSoilBank(masses, waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea, minimumTemperature, greenhouseDimensions, startingTemperature, year, surfaceAreaPex, solar_efficiency, greenhouse_effect, insulationThickness, monotonic=False, integrator=None, weather=None, days=364, record=None, recordEvery=60, checkpoints=None, resume=None, search=None, model=None):
+	"""simulate days (a year by default) for every soil bank mass in masses at once as runs of a ThermalNetwork,
+	one euler step per second or with an integrator from the integrators module.
+	returns an array that is True where the soil bed dropped below minimumTemperature.
+	a run that has failed is dropped from the network and the simulation stops as soon as every run has failed.
+	with monotonic, a failing mass also fails every smaller mass, so their outcome is settled without waiting for them.
+	record is a directory the soil bank masses and every body's temperature are recorded to every recordEvery seconds (see the recorder module).
+	checkpoints (see the checkpoint module) saves the state along with the search state of findSoilBankAreaArray, and
+	resume is a loaded checkpoint to continue from.  model is the model the network is compiled from (see soilBankModel)"""
+	import numpy as np
+	from weatherstore import epochSeconds
+
+	network = soilBankNetwork(masses, waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea, greenhouseDimensions, startingTemperature, surfaceAreaPex, solar_efficiency, greenhouse_effect, insulationThickness, model)
+
+	recorder = None
+
+	if record:
+		from recorder import Recorder
+		names = sorted(network.index, key=network.index.get)
+		recorder = Recorder(record, [(name, (len(masses),)) for name in ["soilBankMass"] + names], recordEvery, append=True)
+
+	temperature = network.temperature
+	outside = network.index[soilBankModel(model).boundaries()["outside"]]
+	soilBed = network.index["soilBed"]
+	step = network.step
+
+	failed = np.zeros(len(masses), dtype=bool)
+	date = datetime(year, 1, 1)
+	first = 0
+
+	"the masses still simulated; column i of the network is the run of masses[active[i]]"
+	active = np.arange(len(masses))
+
+	def everyRun(values):
+		"values of the active runs spread over every mass, NaN for the runs dropped"
+		spread = np.full(values.shape[:-1] + (len(masses),), np.nan)
+		spread[..., active] = values
+		return spread
+
+	if resume:
+		temperature[...] = resume["temperature"]
+		network.enthalpy[...] = np.reshape(resume.get("enthalpy", network.enthalpy), network.enthalpy.shape)
+		failed[:] = resume["failed"]
+		date = datetime.fromisoformat(resume["date"])
+		first = resume["day"]
+
+		active = np.flatnonzero(~failed)
+		network.selectRuns(active)
+		temperature = network.temperature
+
+	from daypipeline import DayPipeline
+	with DayPipeline(dayInputs, date, days - first, weather, workers) as pipeline:
+		for day in range(first, days):
+			if checkpoints and checkpoints.due(day):
+				search = search or {"pass" : 0}
+				checkpoints.save("array_pass{:02d}_day{:03d}".format(search["pass"], day), {
+					"engine" : "array",
+					"search" : search,
+					"day" : day,
+					"date" : date.isoformat(),
+					"masses" : masses.tolist(),
+					"temperature" : everyRun(temperature).tolist(),
+					"enthalpy" : everyRun(network.enthalpy).tolist(),
+					"failed" : failed.tolist()
+				})
+
+			if ui:
+				ui.event("day", day+1)
+
+			if profiler:
+				profiler.day(day)
+
+			solarPower, outsideAirTemp, conditions = pipeline.next()
+
+			print("calculating day: {}.  Soil bed: {}, water: {}, greenhouse: {} (soil bank mass = {}g)".format(date, temperature[soilBed, 0], network.getTemperature("water")[0], network.getTemperature("greenhouse")[0], masses[active[0]]))
+
+			midnight = epochSeconds(date)
+
+			if integrator:
+				def forcing(t):
+					second = min(int(t), 86399)
+					return solarPower[second], outsideAirTemp[second]
+
+				"when recording, stop the integrator at every sample"
+				span = recordEvery if recorder else 86400
+
+				for start in range(0, 86400, span):
+					seconds = min(span, 86400 - start)
+					network.advance(seconds, forcing, integrator, start)
+
+					if recorder:
+						recorder.record(midnight + start + seconds, masses, *everyRun(temperature))
+			else:
+				for second in range(86400):
+					temperature[outside] = outsideAirTemp[second]
+					step(solarPower[second])
+
+					if recorder and recorder.due():
+						recorder.record(midnight + second + 1, masses, *everyRun(temperature))
+
+			date += timedelta(days = 1)
+
+			below = temperature[soilBed] < minimumTemperature
+			for column in np.flatnonzero(below):
+				print("We failed at {0} with soil bed temperature = {1}C and soil bank mass = {2}g".format(date, temperature[soilBed, column], masses[active[column]]))
+
+			failing = np.zeros(len(masses), dtype=bool)
+			failing[active[below]] = True
+			failed |= failing
+
+			if ui:
+				ui.frame({"date" : str(date), "soilBankMasses" : masses.tolist(), "soilBedTemps" : [None if np.isnan(t) else t for t in everyRun(temperature[soilBed]).tolist()], "failed" : failed.tolist()})
+
+			if monotonic and failing.any():
+				failed |= masses <= np.max(masses[failing])
+
+			if failed.all():
+				break
 
-def pexLength(pexSurfaceArea, soilBankVolume):
-	spacing = 0.11 #m
-	return soilBankVolume / pexSurfaceArea * (spacing * 2)
-
-def findSoilBankArea(waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea, minimumTemperature, greenhouseDimensions, startingTemperature = 15, year=2015, debug=False):
+			"stop stepping the runs whose outcome is settled"
+			keep = ~failed[active]
+			if not keep.all():
+				network.selectRuns(np.flatnonzero(keep))
+				active = active[keep]
+				temperature = network.temperature
+
+	if recorder:
+		recorder.close()
+
+	return failed
+
+def findSoilBankAreaArray(waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea, minimumTemperature, greenhouseDimensions, startingTemperature, year, surfaceAreaPex, solar_efficiency, greenhouse_effect, insulationThickness, candidates=16, tolerance=None, integrator=None, weather=None, days=364, record=None, recordEvery=60, checkpoints=None, resume=None, model=None):
+	"""same search as findSoilBankArea, but every doubling of the soil bank mass is simulated at once.
+	returns the smallest doubled mass that never lets the soil bed drop below minimumTemperature.
+
+	with a tolerance (g) the doubling only brackets the answer, which is then narrowed by
+	splitting the bracket into candidates masses per simulated year until it is within tolerance.
+	the search state goes into every checkpoint, so resume (a loaded checkpoint) picks the search up where it was"""
+	import numpy as np
+
+	if tolerance is not None and tolerance <= 0:
+		raise Exception("error: the soil bank mass tolerance must be more than 0g, not {}".format(tolerance))
+
+	simulation = (waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea, minimumTemperature, greenhouseDimensions, startingTemperature, year, surfaceAreaPex, solar_efficiency, greenhouse_effect, insulationThickness)
+	options = {"integrator" : integrator, "weather" : weather, "days" : days, "record" : record, "recordEvery" : recordEvery, "checkpoints" : checkpoints, "model" : model}
+
+	search = {"pass" : 0, "phase" : "double", "soilBankMass" : 10, "lower" : 0, "upper" : None}
+
+	if resume:
+		search = dict(resume["search"])
+
+	while search["phase"] == "double":
+		masses = search["soilBankMass"] * np.power(2.0, np.arange(candidates))
+		failed = simulateSoilBank(masses, *simulation, resume=resume, search=search, **options)
+		resume = None
+
+		search["pass"] += 1
+
+		if not failed.all():
+			first = np.argmin(failed)
+			search["upper"] = masses[first]
+			if first:
+				search["lower"] = masses[first - 1]
+			search["phase"] = "narrow"
+		else:
+			search["lower"] = masses[-1]
+			search["soilBankMass"] = masses[-1] * 2
+
+	if tolerance is None:
+		return search["upper"]
+
+	while search["upper"] - search["lower"] > tolerance:
+		print("narrowing soil bank mass between {}g and {}g".format(search["lower"], search["upper"]))
+
+		masses = np.linspace(search["lower"], search["upper"], candidates + 2)[1:-1]
+		failed = simulateSoilBank(masses, *simulation, monotonic=True, resume=resume, search=search, **options)
+		resume = None
+
+		search["pass"] += 1
+
+		if failed.all():
+			search["lower"] = masses[-1]
+		else:
+			first = np.argmin(failed)
+			search["upper"] = masses[first]
+			if first:
+				search["lower"] = masses[first - 1]
+
+	return search["upper"]
+
+def findSoilBankArea(waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea, minimumTemperature, greenhouseDimensions, startingTemperature = 15, year=2015, debug=False, engine="objects", tolerance=None, integrator=None, insulationThickness=0.127, timeline=False, days=364, record=None, recordEvery=60, checkpoint=None, checkpointEvery=7, resume=None, model=None):
+	"""engine "objects" steps ThermalObjects one exchange at a time, "array" steps every candidate soil bank mass at once on a ThermalNetwork.
+	tolerance (g) switches the array engine from doubling to bracketing and bisecting the soil bank mass.
+	integrator (see the integrators module) replaces the array engine's one second euler steps; the objects engine refuses one.
+	timeline interpolates the outside air between weather observations instead of switching between the daily min and max.
+	days is the length of the simulated run.
+	record is a directory every body's temperature is recorded to every recordEvery simulated seconds, for every soil bank mass tried.
+	checkpoint is a directory the state of the run is saved to every checkpointEvery simulated days; resume is a loaded
+	checkpoint to continue from (see the checkpoint module, which also forks runs from checkpoints).
+	model is the array engine's model of the greenhouse (see soilBankModel): a Model, or a model or greenhouse file"""
 	import pdb
-	from pysolar import radiation
-	from pysolar import solar
-
-	greenhouseVolume = greenhouseDimensions[0] * greenhouseDimensions[1] * greenhouseDimensions[2]
-	greenhouseHeight = greenhouseDimensions[2]
-	greenhouseSurfaceArea = greenhouseDimensions[0] * greenhouseDimensions[1]
+	from weatherstore import epochSeconds
+
+	if tolerance is not None and engine != "array":
+		raise Exception("error: a tolerance needs the array engine; the {} engine only doubles the soil bank mass".format(engine))
+
+	if integrator is not None and engine != "array":
+		raise Exception("error: an integrator needs the array engine; the {} engine steps one second at a time".format(engine))
+
+	checkpoints = None
+
+	if checkpoint:
+		from checkpoint import Checkpoints, describeIntegrator, describeModel
+
+		checkpoints = Checkpoints(checkpoint, checkpointEvery, {
+			"waterMass" : waterMass,
+			"waterSurfaceArea" : waterSurfaceArea,
+			"soilBedMass" : soilBedMass,
+			"soilBedSurfaceArea" : soilBedSurfaceArea,
+			"minimumTemperature" : minimumTemperature,
+			"greenhouseDimensions" : list(greenhouseDimensions),
+			"startingTemperature" : startingTemperature,
+			"year" : year,
+			"engine" : engine,
+			"tolerance" : tolerance,
+			"integrator" : describeIntegrator(integrator),
+			"insulationThickness" : insulationThickness,
+			"timeline" : timeline,
+			"days" : days,
+			"record" : record,
+			"recordEvery" : recordEvery,
+			"checkpoint" : checkpoint,
+			"checkpointEvery" : checkpointEvery,
+			"model" : describeModel(model)
+		}, {
+			"weather" : weatherSource,
+			"workers" : workers
+		})
 
-	airMass = greenhouseVolume * ThermalConstants.Density.air
 	soilBankMass = 10 #g
-	soilBedVolume = soilBedMass / ThermalConstants.Density.soil
 
-	pexRadius = 1.5875 #cm
-	surfaceAreaPex = (2 * math.pi * pexRadius) / 100 #m^2
+	"the pex tubing's surface area per m, the solar efficiency and the greenhouse effect (the fraction of radiated energy regained) come from the model"
+	parameters = soilBankModel(model).resolved()
+
+	surfaceAreaPex = parameters["surfaceAreaPex"] #m^2
+	solar_efficiency = parameters["solarEfficiency"]
+	greenhouse_effect = parameters["greenhouseEffect"]
+
+	weather = None
 
-	solar_efficiency = 0.7
-	greenhouse_effect = 0.10 #you will regain this percentage of radiated energy
+	if timeline:
+		weather = weatherTimeline(year, days)
+	else:
+		prefetchWeather(year, days)
+
+	if engine == "array":
+		soilBankMass = findSoilBankAreaArray(waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea, minimumTemperature, greenhouseDimensions, startingTemperature, year, surfaceAreaPex, solar_efficiency, greenhouse_effect, insulationThickness, tolerance=tolerance, integrator=integrator, weather=weather, days=days, record=record, recordEvery=recordEvery, checkpoints=checkpoints, resume=resume, model=model)
+		print ("success with soil bank mass: {0}".format(soilBankMass))
+		return soilBankMass
 
 	fail = True
 	failDate = None
 	failTemperature = None
 
+	recorder = None
+
+	if record:
+		from recorder import Recorder
+		recorder = Recorder(record, ["soilBankMass"] + list(soilBankModel(model).bodies) + ["solarPower"], recordEvery, append=True)
+
+	if resume:
+		soilBankMass = resume["soilBankMass"]
+
 	while fail:
-		water = Water(mass = waterMass, temperature = startingTemperature)
-		soilBank = Soil(mass = soilBankMass, temperature = startingTemperature)
-		soilBed = Soil(mass = soilBedMass, temperature = startingTemperature)
-		greenhouse = Soil(mass = greenhouseSurfaceArea * ThermalConstants.Density.soil, temperature = startingTemperature)
-		air = Air(mass = airMass, temperature = startingTemperature)
-		air_outside = Air(mass = 99999999999999, temperature = startingTemperature)
+		"the exchanges are compiled once per soil bank mass; the loop below only steps them"
+		graph = soilBankGraph(soilBankMass, waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea, greenhouseDimensions, startingTemperature, surfaceAreaPex, solar_efficiency, greenhouse_effect, insulationThickness, model)
+		step = graph.step
+
+		bodies = graph.bodies
+		water = bodies["water"]
+		soilBank = bodies["soilBank"]
+		soilBed = bodies["soilBed"]
+		greenhouse = bodies["greenhouse"]
+		air = bodies["air"]
+		air_outside = bodies[soilBankModel(model).boundaries()["outside"]]
 
 		soilBankVolume = soilBankMass / ThermalConstants.Density.soil
 
 		fail = False
 		date = datetime(year, 1, 1)
+		first = 0
 
-		for day in range(364):
-			if hasOtherSide:
-				pyotherside.send("day", day+1)
-
-			if fail:
-				break
-
-			minAirTemp, maxAirTemp, observations = wuGetAirTemperature(date)
-			condition = "Clear"
-			outsideAirTemp = float(minAirTemp)
-
-			print("calculating day: {}.  Soil bed: {}, water: {}, greenhouse: {}".format(date, soilBed.temperature, water.temperature, greenhouse.temperature))
+		if resume:
+			for name, body in bodies.items():
+				body.temperature = resume["temperatures"][name]
 
-			air_high_temp = 15
+			"bodies that freeze are restored from their enthalpy, which their temperature alone does not give on the plateau"
+			for name, value in resume.get("enthalpies", {}).items():
+				bodies[name].enthalpy = value
 
-			"run through every second in the day"
-			for second in range(86400):
+			date = datetime.fromisoformat(resume["date"])
+			first = resume["day"]
+			resume = None
 
+		from daypipeline import DayPipeline
+		with DayPipeline(dayInputs, date, days - first, weather, workers) as pipeline:
+			for day in range(first, days):
+				if fail:
+					break
 
-				solarAlt = solar.get_altitude(45.542384, -122.961576, date)
+				if checkpoints and checkpoints.due(day):
+					checkpoints.save("objects_{:g}g_day{:03d}".format(soilBankMass, day), {
+						"engine" : "objects",
+						"soilBankMass" : soilBankMass,
+						"day" : day,
+						"date" : date.isoformat(),
+						"temperatures" : dict((name, body.temperature) for name, body in bodies.items()),
+						"enthalpies" : dict((name, body.enthalpy) for name, body in bodies.items() if body.specificLatentHeat)
+					})
 
-				solarPower = 0
+				if ui:
+					ui.event("day", day+1)
 
-				cond = weatherGetConditions(date, observations)
+				if profiler:
+					profiler.day(day)
 
-				if cond:
-					condition = cond
+				dailySolarPower, dailyOutsideAirTemp, dailyConditions = pipeline.next()
 
-				if solarAlt > 0:
-					solarPower = radiation.get_radiation_direct(date, solarAlt)
-					"factor in clouds "
-					solarPower = solarPower * getRadiationVisibilityCoefficient(condition)
-					if solarPower >= 1:
-						outsideAirTemp = float(maxAirTemp)
-						#debugOut("solarInput: {0}".format(solarPower * greenhouseSurfaceArea))
+				print("calculating day: {}.  Soil bed: {}, water: {}, greenhouse: {}".format(date, soilBed.temperature, water.temperature, greenhouse.temperature))
 
-					else:
-						outsideAirTemp = float(minAirTemp)
+				air_high_temp = 15
 
-				air_outside.temperature = outsideAirTemp
+				"run through every second in the day"
+				for second in range(86400):
 
-				"add solar energy to system:"
+					solarPower = dailySolarPower[second]
+					condition = dailyConditions[second]
 
-				water.energy += solarPower * waterSurfaceArea * solar_efficiency
-				greenhouse.energy += solarPower * greenhouseSurfaceArea * solar_efficiency
+					air_outside.temperature = dailyOutsideAirTemp[second]
 
-				"the soil bed is likely shadowed by plants"
-				#soilBed.energy += solarPower * soilBedSurfaceArea * solar_efficiency
+					"add solar energy to the water and greenhouse, exchange energy through the pex and with the air, and radiate to the outside world minus the greenhouse effect"
+					step(solarPower)
 
-				"transfer energy first to soil bed then remove the energy transferred from the water"
-				pl = pexLength(surfaceAreaPex, soilBedVolume)
+					if air.temperature > air_high_temp:
+						air_high_temp = air.temperature
 
-				water.transferTo(soilBed, pl, length=0.22)
+					if debug:
+						pdb.set_trace()
 
-				"now transfer energy to the soil bank from water:"
+					"emit updated results to UI, a batch at a time"
+					if ui and ui.due():
+						ui.frame({
+							"waterTemperature" : water.temperature,
+							"soilBedTemp" : soilBed.temperature,
+							"soilBankTemp" : soilBank.temperature,
+							"date" : str(date),
+							"soilBankVolume" : soilBankVolume,
+							"airTemp" : air.temperature,
+							"condition" : condition
+						})
 
-				pl = pexLength(surfaceAreaPex, soilBankVolume)
+					"Check to see if bank temp is higher than soilBed or water.  If so, we need to transfer energy from the bank to the soil"
 
-				water.transferTo(soilBank, pl, length=0.22)
+					date += timedelta(seconds = 1)
 
-				"radiant aisle heating"
-				pl = pexLength(surfaceAreaPex, greenhouseSurfaceArea * 0.06)
+					if recorder and recorder.due():
+						recorder.record(epochSeconds(date), soilBankMass, *[body.temperature for body in bodies.values()], solarPower)
 
-				water.transferTo(greenhouse, pl)
+				print("daily high air temp: {}".format(air_high_temp))
 
-				"greenhouse surface area can xfer to soilBed too"
+				"check to see if we are colder than the min temperature"
+				if soilBed.temperature < minimumTemperature:
+					failDate = date
+					failTemperature = soilBed.temperature
+					fail = True
+					if ui:
+						ui.event("failDate", str(failDate))
 
-				greenhouse.transferTo(soilBed, soilBedSurfaceArea)
-
-				"caculate losses to the air."
-
-				greenhouse.transferTo(air, greenhouseSurfaceArea)
-				soilBed.transferTo(air, soilBedSurfaceArea)
-				water.transferTo(air, waterSurfaceArea)
-
-				"determine air loss to outside air"
-
-				airInsulationThickness = 0.127 #m
-
-				air.transferTo(air_outside, greenhouseSurfaceArea, length = airInsulationThickness)
-
-				"radiate to the outside world minus greenhouse effect"
-
-				greenhouse.energy += greenhouse.radiate() * greenhouse_effect
-				water.energy += water.radiate() * greenhouse_effect
-				soilBed.energy += soilBed.radiate() * greenhouse_effect
-				#air.radiate()
-
-				if air.temperature > air_high_temp:
-					air_high_temp = air.temperature
-
-				if debug:
-					pdb.set_trace()
-
-				"emit updated results to UI"
-				if hasOtherSide:
-					pyotherside.send("waterTemperature", waterTemp)
-					pyotherside.send("soilBedTemp", soilBedTemp)
-					pyotherside.send("soilBankTemp", soilBankTemp)
-					pyotherside.send("date", str(date))
-					pyotherside.send("soilBankVolume", soilBankVolume)
-					pyotherside.send("airTemp", airTemp)
-					pyotherside.send("condition", condition)
-
-				"Check to see if bank temp is higher than soilBed or water.  If so, we need to transfer energy from the bank to the soil"
-
-				date += timedelta(seconds = 1)
-
-			print("daily high air temp: {}".format(air_high_temp))
-
-			"check to see if we are colder than the min temperature"
-			if soilBed.temperature < minimumTemperature:
-				failDate = date
-				failTemperature = soilBed.temperature
-				fail = True
-				if hasOtherSide:
-					pyotherside.send("failDate", failDate)
-
-				print("We failed at {0} with soil bed temperature = {1}C and soil bank mass = {2}g".format(failDate, failTemperature, soilBankMass))
-				print("air temps: inside: {}C outside: {}C".format(air.temperature, air_outside.temperature))
+					print("We failed at {0} with soil bed temperature = {1}C and soil bank mass = {2}g".format(failDate, failTemperature, soilBankMass))
+					print("air temps: inside: {}C outside: {}C".format(air.temperature, air_outside.temperature))
 
 		if fail:
 			"we kinda failed, so let's double our soilBankVolume and try again"
 			soilBankMass += soilBankMass
 
+	if recorder:
+		recorder.close()
+
 	print ("success with soil bank mass: {0}".format(soilBankMass))
 
+	return soilBankMass
+
 if __name__ == "__main__":
 
-	waterMass = 0.20819755 * ThermalConstants.Density.water #m^3 * density (g/m^3).  55 gallons = 0.2082 cu meters
-	waterSurfaceArea = 0.74322432 #m^2.  This is 2ft by 4ft square (0.6096 * 1.2192)
-	soilBedMass = 424753 #g
-	soilBedDimensions = (3.6576, 0.4572, 0.3048) #m
-	soilBedSurfaceArea = soilBedDimensions[0] * soilBedDimensions[1] #m^2
-	minimumTemperature = 0
-	startingTemperature = 15
-	greenhouseDimensions = (4.8768, 1.8288, 2.7432) #g; density of air is 1225g/m^3.  We could also factor in humidity to add density but maybe later
 	debug = False
 
-	findSoilBankArea(waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea,  minimumTemperature, greenhouseDimensions, startingTemperature = startingTemperature, debug = debug)
+	import argparse
+
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--model", help="model of the greenhouse: a model file or a greenhouse file with a model (see model.py)", default=soilBankModelFile, type=str)
+	parser.add_argument("--engine", help="objects or array", default="objects", type=str)
+	parser.add_argument("--tolerance", help="bisect the soil bank mass down to this many grams (array engine)", default=None, type=float)
+	parser.add_argument("--integrator", help="euler, rk4 or adaptive (array engine)", default=None, type=str)
+	parser.add_argument("--step", help="integrator step in seconds; the starting step for adaptive", default=None, type=float)
+	parser.add_argument("--error", help="largest temperature error per step in C for the adaptive integrator", default=0.001, type=float)
+	parser.add_argument("--timeline", help="interpolate outside air between weather observations", action="store_true")
+	parser.add_argument("--record", help="directory to record every body's temperature to", default=None, type=str)
+	parser.add_argument("--record-every", help="simulated seconds between recorded samples", default=60, type=int)
+	parser.add_argument("--ui", help="where to send progress frames: pyotherside, stdout, socket:HOST:PORT or none", default="none", type=str)
+	parser.add_argument("--ui-interval", help="wall clock seconds between progress frames", default=0.1, type=float)
+	parser.add_argument("--checkpoint", help="directory to save checkpoints of the run to; continue or fork from one with checkpoint.py", default=None, type=str)
+	parser.add_argument("--checkpoint-every", help="simulated days between checkpoints", default=7, type=int)
+	parser.add_argument("--profile", help="time the phases of the simulation and report every this many wall clock seconds", default=None, type=float)
+	parser.add_argument("--profile-days", help="FIRST:LAST simulated days to run cProfile over", default=None, type=str)
+	parser.add_argument("--profile-dump", help="pstats file for --profile-days", default="profile.pstats", type=str)
+	parser.add_argument("--workers", help="processes preparing the solar and weather inputs of the next days while a day is simulated", default=0, type=int)
+	parser.add_argument("--weather", help="provider for days missing from the weather cache: wunderground, climate, a normals .json file, a directory of cached days or a history api url", default="wunderground", type=str)
+	args = parser.parse_args()
+
+	"waterMass: 55 gallons = 0.2082 cu meters of water.  waterSurfaceArea: 2ft by 4ft square (0.6096 * 1.2192)"
+	parameters = soilBankModel(args.model).resolved()
+
+	waterMass = parameters["waterMass"] #g
+	waterSurfaceArea = parameters["waterSurfaceArea"] #m^2
+	soilBedMass = parameters["soilBedMass"] #g
+	soilBedSurfaceArea = parameters["soilBedSurfaceArea"] #m^2
+	minimumTemperature = parameters["minimumTemperature"]
+	startingTemperature = parameters["startingTemperature"]
+	greenhouseDimensions = parameters["greenhouseDimensions"] #m; density of air is 1225g/m^3.  We could also factor in humidity to add density but maybe later
+	insulationThickness = parameters["insulationThickness"] #m
+
+	configure(args.weather, args.workers, args.ui, args.ui_interval, args.profile, args.profile_days, args.profile_dump)
+
+	import integrators
+
+	integrator = None
+
+	if args.integrator == "euler":
+		integrator = integrators.Euler(args.step or 1)
+	elif args.integrator == "rk4":
+		integrator = integrators.RK4(args.step or 60)
+	elif args.integrator == "adaptive":
+		integrator = integrators.Adaptive(args.error, args.step or 60)
+
+	findSoilBankArea(waterMass, waterSurfaceArea, soilBedMass, soilBedSurfaceArea,  minimumTemperature, greenhouseDimensions, startingTemperature = startingTemperature, debug = debug, engine = args.engine, insulationThickness = insulationThickness, model = args.model, tolerance = args.tolerance, integrator = integrator, timeline = args.timeline, record = args.record, recordEvery = args.record_every, checkpoint = args.checkpoint, checkpointEvery = args.checkpoint_every)
+
+	if profiler:
+		profiler.close()
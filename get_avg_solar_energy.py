@@ -8,38 +8,99 @@ import os.path
 
 import json
 from urllib.request import urlopen
-from pysolar import radiation
-from pysolar import solar
+from solartable import solarWindow
 import numpy as np
 
 def get_solar_radiation(lat, lon, date):
 
-	solarAlt = solar.get_altitude(lat, lon, date)
+	altitude, radiation = solarWindow(lat, lon, date, 1)
 
-	solarPower = 0
-
-	if solarAlt <= 0:
-		return 0
-
-	return radiation.get_radiation_direct(date, solarAlt)
+	return radiation[0]
 
 def get_solar_radiation_data(date, days, lat, lon):
 	radiation = []
 
 	for i in range(days):
-		daily_radiation = 0.0
-		counted_hrs = 0.0
-		for i in range(3600 * 24):
+		altitude, r = solarWindow(lat, lon, date, 3600 * 24)
+
+		radiation.append(r[r > 0])
+
+		date += timedelta(days = 1)
+
+
+	return np.concatenate(radiation)
+
+class SolarStatistics(object):
+	"""running statistics of direct radiation (W/m^2) in constant memory: mean, max and min while the sun is up,
+	percentiles from a histogram with binWidth W/m^2 bins, and the insolation (kWh/m^2) of every day and month"""
+
+	def __init__(self, binWidth=1.0, maxRadiation=1500.0):
+		object.__init__(self)
+
+		self.binWidth = binWidth
+		self.histogram = np.zeros(int(math.ceil(maxRadiation / binWidth)) + 1, dtype=np.int64)
+
+		self.count = 0
+		self.total = 0.0
+		self.max = None
+		self.min = None
+
+		self.days = []
+		self.months = {}
+
+	def add(self, date, radiation, step):
+		"a day of radiation sampled every step seconds, starting at date"
+
+		up = radiation[radiation > 0]
+		insolation = float(np.sum(radiation, dtype=float)) * step / 3600000.0 #kWh/m^2
 
-			r = get_solar_radiation(lat, lon, date)
+		if len(up):
+			self.count += len(up)
+			self.total += float(np.sum(up, dtype=float))
+			self.max = max(self.max, float(up.max())) if self.max is not None else float(up.max())
+			self.min = min(self.min, float(up.min())) if self.min is not None else float(up.min())
 
-			if r:
-				radiation.append(r)
+			bins = np.minimum((up / self.binWidth).astype(np.int64), len(self.histogram) - 1)
+			self.histogram += np.bincount(bins, minlength=len(self.histogram))
 
-			date += timedelta(seconds = 1)
+		self.days.append({
+			"date" : date.strftime("%Y-%m-%d"),
+			"insolation" : insolation,
+			"peak" : float(radiation.max()),
+			"daylight" : len(up) * step / 3600.0
+		})
 
+		month = self.months.setdefault(date.strftime("%Y-%m"), {"days" : 0, "insolation" : 0.0, "peak" : 0.0})
+		month["days"] += 1
+		month["insolation"] += insolation
+		month["peak"] = max(month["peak"], float(radiation.max()))
 
-	return radiation
+	def mean(self):
+		return self.total / self.count if self.count else None
+
+	def percentile(self, q):
+		"q-th percentile (0-100) of the radiation while the sun is up, to within binWidth"
+
+		if not self.count:
+			return None
+
+		rank = q / 100.0 * self.count
+		index = int(np.searchsorted(np.cumsum(self.histogram), max(rank, 1)))
+
+		return min((index + 0.5) * self.binWidth, self.max)
+
+def get_solar_statistics(date, days, lat, lon, resolution=60):
+	"SolarStatistics of days days from date, sampling the radiation every resolution seconds"
+
+	statistics = SolarStatistics()
+
+	for i in range(days):
+		altitude, r = solarWindow(lat, lon, date, 3600 * 24, step=resolution)
+		statistics.add(date, r, resolution)
+
+		date += timedelta(days = 1)
+
+	return statistics
 
 
 if __name__ == "__main__":
@@ -59,6 +120,8 @@ if __name__ == "__main__":
 	parser.add_argument("--lon", help="longitude", default=None, type=float)
 	parser.add_argument("--start", help="starting date in format YYYY-MM-DD", default=datetime.now(), type=valid_date)
 	parser.add_argument("--days", help="number of days", default=30, type=int)
+	parser.add_argument("--resolution", help="seconds between radiation samples", default=60, type=int)
+	parser.add_argument("--summary", help="also print insolation per day or per month: day, month or none", default="none", type=str)
 	args = parser.parse_args()
 
 	greenhouse = {}
@@ -75,11 +138,15 @@ if __name__ == "__main__":
 		args.lon = greenhouse['longitude']
 
 
-	radiation = get_solar_radiation_data(args.start, args.days, args.lat, args.lon)
+	statistics = get_solar_statistics(args.start, args.days, args.lat, args.lon, args.resolution)
+
+	print("avg radiation: {}W/m^2".format(statistics.mean()))
+	print("max radiation: {}W/m^2".format(statistics.max))
+	print("min radiation: {}W/m^2".format(statistics.min))
+	print("radiation percentiles: 10%: {}W/m^2 50%: {}W/m^2 90%: {}W/m^2".format(statistics.percentile(10), statistics.percentile(50), statistics.percentile(90)))
+	print("avg insolation: {}kWh/m^2/day".format(sum(day["insolation"] for day in statistics.days) / len(statistics.days)))
 
-	print("avg radiation: {}W/m^2".format(np.average(radiation)))
-	print("max radiation: {}W/m^2".format(np.max(radiation)))
-	print("min radiation: {}W/m^2".format(np.min(radiation)))
+	area = None
 
 	if args.greenhouse and "greenhouse_dimensions" in greenhouse:
 		dimensions = greenhouse["greenhouse_dimensions"]
@@ -87,7 +154,21 @@ if __name__ == "__main__":
 
 		print("using greenhouse surface area: {}m^2".format(round(area, 1)))
 
-		print("greenhouse avg radiation: {}W".format(np.average(radiation) * area))
-		print("greenhouse max radiation: {}W".format(np.max(radiation) * area))
-		print("greenhouse min radiation: {}W".format(np.min(radiation) * area))
-
+		print("greenhouse avg radiation: {}W".format(statistics.mean() * area))
+		print("greenhouse max radiation: {}W".format(statistics.max * area))
+		print("greenhouse min radiation: {}W".format(statistics.min * area))
+
+	if args.summary == "day":
+		for day in statistics.days:
+			line = "{}: {:.2f}kWh/m^2, peak {:.0f}W/m^2, {:.1f}hrs of sun".format(day["date"], day["insolation"], day["peak"], day["daylight"])
+			if area:
+				line += ", greenhouse {:.1f}kWh".format(day["insolation"] * area)
+			print(line)
+
+	elif args.summary == "month":
+		for name in sorted(statistics.months):
+			month = statistics.months[name]
+			line = "{}: {:.1f}kWh/m^2 over {} days ({:.2f}kWh/m^2/day), peak {:.0f}W/m^2".format(name, month["insolation"], month["days"], month["insolation"] / month["days"], month["peak"])
+			if area:
+				line += ", greenhouse {:.0f}kWh".format(month["insolation"] * area)
+			print(line)
@@ -1,13 +1,26 @@
-"""greenhouse.py"""
+"""greenhouse.py
+
+	Energy balance of the earth, taken as a 1m deep layer of water that the
+	sun lights over earthSurfaceArea and that radiates over its whole area.
+	equilibriumTemperature() solves the Stefan-Boltzmann balance in closed
+	form; trajectory() integrates the approach to it and returns the
+	temperature at the start of every day.  Radiation is worked out from the
+	absolute temperature; temperatures going in and out are in C.  Every
+	function takes NumPy arrays for its parameters, so a set of scenarios
+	(solar constants, emissivities) is evaluated at once.
+"""
 
 import math
-import geothermal
+import numpy as np
+
+import integrators
+from thermalobject import ThermalConstants, radiantEnergy, c_to_kelvin, kelvin_to_c
 
 earthSurfaceArea = 1.28 * math.pow(10,8) * 1000 #m^2 - area where earth meets sun
 totalEarthArea = 510.1 * math.pow(10, 6) * 1000 #m^2
 
 "earth mass at surface to 1m deep: "
-earthMass = totalEarthArea * geothermal.ThermalConstants.Density.water
+earthMass = totalEarthArea * ThermalConstants.Density.water
 
 darkArea = totalEarthArea - earthSurfaceArea
 
@@ -15,33 +28,76 @@ solarConstant = 1362 #W/m^2
 
 co2 = 400 #ppm
 
-avgTemp = 0
-gain = 1
-loss = 0
+def solarGain(solarConstant=solarConstant, sunlitArea=earthSurfaceArea):
+	"W from the sun"
+	return solarConstant * sunlitArea
+
+def equilibriumTemperature(solarConstant=solarConstant, emissivity=ThermalConstants.Emissivity.water, sunlitArea=earthSurfaceArea, area=totalEarthArea):
+	"C at which the energy radiated over area balances the sun over sunlitArea"
+	return kelvin_to_c((solarGain(solarConstant, sunlitArea) / radiantEnergy(emissivity, area, 1)) ** 0.25)
+
+def netGain(temperature, solarConstant=solarConstant, emissivity=ThermalConstants.Emissivity.water, sunlitArea=earthSurfaceArea, area=totalEarthArea):
+	"W gained from the sun minus W radiated at temperature (C)"
+	return solarGain(solarConstant, sunlitArea) - radiantEnergy(emissivity, area, c_to_kelvin(temperature))
+
+def trajectory(days=364, temperature=0, integrator=None, solarConstant=solarConstant, emissivity=ThermalConstants.Emissivity.water, sunlitArea=earthSurfaceArea, area=totalEarthArea, mass=earthMass):
+	"""temperature (C) at the start of each of days + 1 days, starting from temperature.
+	integrator is from the integrators module; the default adaptive one takes steps of up to a day, so a year
+	costs a few thousand evaluations.  returns an array of shape (days + 1,) plus the shape of the parameters"""
+
+	capacity = mass * ThermalConstants.SpecificHeat.water
+
+	def f(t, y):
+		return netGain(y, solarConstant, emissivity, sunlitArea, area) / capacity
+
+	if integrator is None:
+		integrator = integrators.Adaptive(tolerance=0.001, step=3600, maxStep=86400)
+
+	y = np.asarray(temperature + 0 * netGain(temperature, solarConstant, emissivity, sunlitArea, area), dtype=float)
+
+	temperatures = np.empty((days + 1,) + y.shape)
+	temperatures[0] = y
 
-while loss < gain:
+	for day in range(days):
+		y, steps = integrators.integrate(f, day * 86400, (day + 1) * 86400, y, integrator)
+		temperatures[day + 1] = y
 
-	for second in range(86400 * 364):
-	
-		"assume the earth is full of water."
+	return temperatures
 
-		earthEnergy = geothermal.energyCapacity(geothermal.ThermalConstants.SpecificHeat.water, earthMass, avgTemp)
+if __name__ == "__main__":
 
-		"estimate radiation loss for entire earth"
+	import argparse
 
-		loss = geothermal.radiantEnergy(geothermal.ThermalConstants.Emissivity.water, totalEarthArea, avgTemp)
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--days", help="days to simulate", default=364, type=int)
+	parser.add_argument("--start", help="starting temperature in C", default=0, type=float)
+	parser.add_argument("--solar-constant", help="W/m^2", default=solarConstant, type=float)
+	parser.add_argument("--emissivity", help="emissivity of the surface", default=ThermalConstants.Emissivity.water, type=float)
+	parser.add_argument("--integrator", help="euler, rk4 or adaptive", default="adaptive", type=str)
+	parser.add_argument("--step", help="integrator step in seconds; the starting step for adaptive", default=3600, type=float)
+	parser.add_argument("--every", help="print the temperature every this many days", default=30, type=int)
+	args = parser.parse_args()
 
-		"add energy from the sun"
-		gain = solarConstant * earthSurfaceArea
+	integrator = None
 
-		earthEnergy -= loss
-		earthEnergy += gain
+	if args.integrator == "euler":
+		integrator = integrators.Euler(args.step)
+	elif args.integrator == "rk4":
+		integrator = integrators.RK4(args.step)
+	elif args.integrator == "adaptive":
+		integrator = integrators.Adaptive(0.001, args.step, maxStep=86400)
+	else:
+		raise Exception("error: unknown integrator \"{}\"".format(args.integrator))
 
-		avgTemp = geothermal.temperature(geothermal.ThermalConstants.SpecificHeat.water, earthMass, earthEnergy)
+	equilibrium = equilibriumTemperature(args.solar_constant, args.emissivity)
+	temperatures = trajectory(args.days, args.start, integrator, args.solar_constant, args.emissivity)
 
-		if second % 86400 == 0:
-			print("day {0}".format(second / 86400))
-			print("avgTemp = {0}".format(avgTemp))
+	print("equilibrium temperature: {}C".format(equilibrium))
 
+	for day in range(0, args.days + 1, args.every):
+		print("day {0}: avgTemp = {1}C".format(day, temperatures[day]))
 
+	close = np.nonzero(np.abs(temperatures - equilibrium) < 1)[0]
 
+	if len(close):
+		print("within 1C of equilibrium after {} days".format(close[0]))
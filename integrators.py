@@ -0,0 +1,104 @@
+"""
+	integrators
+
+	Time stepping schemes for ThermalNetwork heat exchange.  Every integrator
+	advances dy/dt = f(t, y) by a requested step and returns the new state,
+	the step it actually took and the step to try next, so fixed step and
+	error controlled schemes are interchangeable.
+"""
+import numpy as np
+
+class Euler(object):
+	"explicit euler with a fixed step, what the simulations have always done"
+
+	fixedStep = True
+
+	def __init__(self, step=1):
+		object.__init__(self)
+		self.initialStep = step
+
+	def step(self, f, t, y, dt):
+		return y + dt * f(t, y), dt, dt
+
+class RK4(object):
+	"classic fourth order runge-kutta with a fixed step"
+
+	fixedStep = True
+
+	def __init__(self, step=60):
+		object.__init__(self)
+		self.initialStep = step
+
+	def step(self, f, t, y, dt):
+		k1 = f(t, y)
+		k2 = f(t + dt / 2, y + dt / 2 * k1)
+		k3 = f(t + dt / 2, y + dt / 2 * k2)
+		k4 = f(t + dt, y + dt * k3)
+
+		return y + dt / 6 * (k1 + 2 * k2 + 2 * k3 + k4), dt, dt
+
+class Adaptive(object):
+	"""Dormand-Prince 5(4) with error control.  tolerance is the largest temperature error (C) allowed per step;
+	steps grow up to maxStep while the network is calm and shrink down to minStep around transients"""
+
+	fixedStep = False
+
+	a = [
+		[],
+		[1 / 5.0],
+		[3 / 40.0, 9 / 40.0],
+		[44 / 45.0, -56 / 15.0, 32 / 9.0],
+		[19372 / 6561.0, -25360 / 2187.0, 64448 / 6561.0, -212 / 729.0],
+		[9017 / 3168.0, -355 / 33.0, 46732 / 5247.0, 49 / 176.0, -5103 / 18656.0],
+		[35 / 384.0, 0, 500 / 1113.0, 125 / 192.0, -2187 / 6784.0, 11 / 84.0]
+	]
+	c = [0, 1 / 5.0, 3 / 10.0, 4 / 5.0, 8 / 9.0, 1, 1]
+	"fifth order weights are the last row of a; these are the fourth order ones"
+	b4 = [5179 / 57600.0, 0, 7571 / 16695.0, 393 / 640.0, -92097 / 339200.0, 187 / 2100.0, 1 / 40.0]
+
+	def __init__(self, tolerance=0.001, step=60, minStep=1, maxStep=3600):
+		object.__init__(self)
+		self.tolerance = tolerance
+		self.initialStep = step
+		self.minStep = minStep
+		self.maxStep = maxStep
+
+	def step(self, f, t, y, dt):
+
+		while True:
+			k = []
+			for stage in range(7):
+				yStage = y
+				for weight, kPrevious in zip(self.a[stage], k):
+					if weight:
+						yStage = yStage + dt * weight * kPrevious
+				k.append(f(t + self.c[stage] * dt, yStage))
+
+			"the seventh stage is evaluated at the fifth order solution"
+			y5 = yStage
+			error = dt * np.max(np.abs(sum((b5 - b4) * kStage for b5, b4, kStage in zip(self.a[6] + [0], self.b4, k))))
+
+			if error > 0:
+				scale = min(5.0, max(0.2, 0.9 * (self.tolerance / error) ** 0.2))
+			else:
+				scale = 5.0
+
+			if error <= self.tolerance or dt <= self.minStep:
+				return y5, dt, min(self.maxStep, max(self.minStep, dt * scale))
+
+			dt = max(self.minStep, dt * scale)
+
+def integrate(f, t, end, y, integrator, dt=None):
+	"advance y from t to end with integrator.  returns the final state and the number of steps taken"
+
+	if dt is None:
+		dt = integrator.initialStep
+
+	steps = 0
+
+	while t < end:
+		y, taken, dt = integrator.step(f, t, y, min(dt, end - t))
+		t += taken
+		steps += 1
+
+	return y, steps
@@ -1,62 +1,56 @@
-import thermalobject
-from thermalobject import ThermalConstants
+import os.path
 
-import argparse
+from model import loadModel
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--air", help="starting air temperature", default=0, type=int)
+modelFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ldsprepper.json")
 
-args = parser.parse_args()
+def prep(airTemperature=0, soilTemperature=9, waterTemperature=9, model=modelFile):
+	"hours for the soil mass and for the water mass to bring the air within 1C of them, and their final temperatures"
 
-air_volume = 204
-airMass = air_volume * ThermalConstants.Density.air
-air = thermalobject.Air(mass=airMass)
+	"the soil is 40ft x 20ft x 8ft deep.  its contact area is the length of tube * circumference of tube.  Tube length is 82m.  Tube radius 0.0508m"
+	model = loadModel(model)
+	bodies = model.objects(airTemperature=airTemperature, soilTemperature=soilTemperature, waterTemperature=waterTemperature)
 
-waterMass = 114 * 20 * 1000
-water = thermalobject.Water(mass=waterMass)
+	air = bodies["air"]
+	water = bodies["water"]
+	soil = bodies["soil"]
 
-"40ft x 20ft x 8ft deep"
-soilMass = ThermalConstants.Density.soil * 12 * 6 * 2.4
+	soilContactArea = model.coupling("soil", "air")["contactArea"]
+	waterContactArea = model.coupling("water", "air")["contactArea"]
 
-"length of tube * circumference of tube.  Tube length is 82m.  Tube radius 0.0508m"
-soilContactArea = 26
+	"solve for the time until the air is within 1C of the soil instead of stepping an hour at a time"
+	time_to_transfer = soil.timeToGap(air, 1, contactArea=soilContactArea) / 3600
+	soil.temperature, air.temperature = soil.temperatureAt(air, time_to_transfer * 3600, contactArea=soilContactArea)
 
-soil = thermalobject.Soil(mass=soilMass)
+	soil_time = time_to_transfer
 
-"set temperatures"
+	air.temperature = airTemperature
 
-air.temperature = args.air
-water.temperature = 9
-soil.temperature = 9
+	time_to_transfer = water.timeToGap(air, 1, contactArea = waterContactArea) / 3600
+	water.temperature, air.temperature = water.temperatureAt(air, time_to_transfer * 3600, contactArea = waterContactArea)
 
-time_to_transfer = 0
+	return {
+		"soil_time" : soil_time,
+		"soil_temperature" : soil.temperature,
+		"water_time" : time_to_transfer,
+		"water_temperature" : water.temperature
+	}
 
-def energy_balance(a, b):
-	heating = a.temperature < b.temperature
+if __name__ == "__main__":
 
-	if heating:
-		return a.temperature < b.temperature - 1
-	else:
-		return a.temperature > b.temperature + 1
+	import argparse
 
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--air", help="starting air temperature", default=0, type=int)
+	parser.add_argument("--model", help="model of the air, water and soil (see model.py)", default=modelFile, type=str)
 
-while energy_balance(air, soil):
-	soil.transferTo(air, contactArea=soilContactArea, time=3600)
-	time_to_transfer += 1
+	args = parser.parse_args()
 
-soil_time = time_to_transfer
+	result = prep(args.air, model=args.model)
 
-print("Soil to air time: {}hrs".format(soil_time))
-print("Final soil temperature: {}".format(soil.temperature))
+	print("Soil to air time: {}hrs".format(result["soil_time"]))
+	print("Final soil temperature: {}".format(result["soil_temperature"]))
 
-air.temperature = args.air
-
-time_to_transfer = 0
-
-while energy_balance(air, water):
-	water.transferTo(air, contactArea = 12 * 6, time=3600)
-	time_to_transfer += 1
-
-print("Water to air time: {}hrs".format(time_to_transfer))
-print("delta: {}".format(soil_time - time_to_transfer))
-print("Final water temperature: {}".format(water.temperature))
+	print("Water to air time: {}hrs".format(result["water_time"]))
+	print("delta: {}".format(result["soil_time"] - result["water_time"]))
+	print("Final water temperature: {}".format(result["water_temperature"]))
@@ -0,0 +1,163 @@
+"""
+	materials
+
+	The constant tables (ThermalConstants) and a registry of immutable
+	material records built from them.  A record carries a material's
+	specific heat (J/gC), density (g/m^3), conductivity (W/mC) and emissivity
+	along with quantities derived from them once: volumetric heat capacity
+	(J/m^3C) and thermal diffusivity (m^2/s).  cubeDimensions() caches the
+	side of the cube a mass of material fills, which every body built from a
+	mass alone needs.
+
+	Custom materials (pex, concrete, phase change materials, ...) are loaded
+	from JSON files whose values are numbers in the units above or
+	[value, "unit"] pairs, for example
+
+		"concrete" : {"specificHeat" : [880, "J/kgC"], "density" : [2400, "kg/m^3"], "conductivity" : 1.7, "emissivity" : 0.91}
+
+	Nothing is loaded until asked for: materials.json, next to this module,
+	holds pex, concrete and paraffin, for loadMaterials() or for a model's
+	"materials" section (see the model module).
+"""
+import collections
+import functools
+import json
+import math
+
+class ThermalConstants:
+	class Emissivity:
+		soil = 0.38
+		water = 0.67
+		blackBody = 1
+		aluminum = 0.09
+		glass = 0
+
+	class Density:
+		"g/m^3"
+		air = 1225
+		soil = 1600000
+		water =  1000000
+		aluminum = 2712000
+		glass = 2600000
+
+
+	class SpecificHeat:
+		"measured in J/g"
+		water = 4.184
+		soil = 1.480
+		air = 1.003
+		aluminum = 0.9
+		glass = 0.753
+
+	class Conductivity:
+		"in joules/(sec*m*C) or k-value"
+		soil = 1.0
+		water = 0.58
+		pex = 0.4
+		air = 0.024
+		aluminum = 205
+		glass = 0.8
+
+	class LatentHeat:
+		"J/g given up on freezing"
+		water = 334
+
+	class FreezingPoint:
+		"C"
+		water = 0
+
+"factors from the units a data file may use to the units of the tables"
+units = {
+	"specificHeat" : {"J/gC" : 1, "J/gK" : 1, "J/kgC" : 0.001, "J/kgK" : 0.001, "kJ/kgC" : 1, "kJ/kgK" : 1},
+	"density" : {"g/m^3" : 1, "kg/m^3" : 1000, "g/cm^3" : 1000000},
+	"conductivity" : {"W/mC" : 1, "W/mK" : 1},
+	"emissivity" : {"" : 1}
+}
+
+class Material(collections.namedtuple("Material", ["name", "specificHeat", "density", "conductivity", "emissivity", "volumetricHeatCapacity", "diffusivity"])):
+	"an immutable material record; the derived quantities are worked out when it is made"
+
+	__slots__ = ()
+
+	def __new__(cls, name, specificHeat, density, conductivity, emissivity=0):
+		volumetricHeatCapacity = specificHeat * density
+
+		return super(Material, cls).__new__(cls, name, specificHeat, density, conductivity, emissivity, volumetricHeatCapacity, conductivity / volumetricHeatCapacity)
+
+	@property
+	def constants(self):
+		"the (specificHeat, density, conductivity, emissivity) ThermalObject takes"
+		return self.specificHeat, self.density, self.conductivity, self.emissivity
+
+	def cubeDimensions(self, mass):
+		return cubeDimensions(self.density, mass)
+
+@functools.lru_cache(maxsize=4096)
+def cubeDimensions(density, mass):
+	"dimensions (m) of the cube mass g of a material of density g/m^3 fills"
+
+	side = math.pow(mass / density, 1 / 3.0)
+	return (side, side, side)
+
+water = Material("water", ThermalConstants.SpecificHeat.water, ThermalConstants.Density.water, ThermalConstants.Conductivity.water, ThermalConstants.Emissivity.water)
+soil = Material("soil", ThermalConstants.SpecificHeat.soil, ThermalConstants.Density.soil, ThermalConstants.Conductivity.soil, ThermalConstants.Emissivity.soil)
+air = Material("air", ThermalConstants.SpecificHeat.air, ThermalConstants.Density.air, ThermalConstants.Conductivity.air, ThermalConstants.Emissivity.blackBody)
+aluminum = Material("aluminum", ThermalConstants.SpecificHeat.aluminum, ThermalConstants.Density.aluminum, ThermalConstants.Conductivity.aluminum, ThermalConstants.Emissivity.aluminum)
+glass = Material("glass", ThermalConstants.SpecificHeat.glass, ThermalConstants.Density.glass, ThermalConstants.Conductivity.glass, ThermalConstants.Emissivity.glass)
+
+registry = dict((m.name, m) for m in (water, soil, air, aluminum, glass))
+
+def register(material):
+	"add a Material to the registry, replacing any of the same name.  returns it"
+	registry[material.name] = material
+	return material
+
+def material(name):
+	"the registered Material called name"
+
+	if name not in registry:
+		raise Exception("error: unknown material \"{}\"; known materials are {}".format(name, ", ".join(sorted(registry))))
+
+	return registry[name]
+
+def convert(name, quantity, value):
+	"value of a material's quantity from a data file, a number or [value, unit], in the units of the tables"
+
+	if isinstance(value, list):
+		value, unit = value
+
+		if unit not in units[quantity]:
+			raise Exception("error: material \"{}\": {} can not be given in {}; use one of {}".format(name, quantity, unit, ", ".join(units[quantity])))
+
+		return value * units[quantity][unit]
+
+	return value
+
+def parseMaterials(definitions):
+	"Materials from a dict of name: {specificHeat, density, conductivity, emissivity}"
+
+	parsed = []
+
+	for name, definition in definitions.items():
+		for key in definition:
+			if key not in units:
+				raise Exception("error: material \"{}\" has unknown property \"{}\"".format(name, key))
+
+		for key in ("specificHeat", "density", "conductivity"):
+			if key not in definition:
+				raise Exception("error: material \"{}\" needs a {}".format(name, key))
+
+		values = dict((key, convert(name, key, value)) for key, value in definition.items())
+		parsed.append(Material(name, values["specificHeat"], values["density"], values["conductivity"], values.get("emissivity", 0)))
+
+	return parsed
+
+def readMaterials(filename):
+	"the Materials in a JSON data file"
+
+	with open(filename, "r") as f:
+		return parseMaterials(json.loads(f.read()))
+
+def loadMaterials(filename):
+	"register the materials in a JSON data file.  returns them"
+	return [register(m) for m in readMaterials(filename)]
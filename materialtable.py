@@ -0,0 +1,177 @@
+"""
+	material table
+
+	Struct-of-arrays storage for models with many bodies (soil layers, tube
+	segments).  Every property is a NumPy column with one row per body, so
+	thousands of bodies cost a few arrays instead of thousands of objects and
+	can be updated in bulk.  table.body(row) gives a ThermalObject view of a
+	row for code that works one body at a time (transferTo, radiate, ...).
+"""
+import numpy as np
+
+from thermalobject import ThermalObject
+from materials import Material
+
+class MaterialTable(object):
+
+	columns = ["specificHeat", "density", "conductivity", "emissivity", "mass", "thermalMass", "temperature"]
+
+	def __init__(self, capacity=1024):
+		object.__init__(self)
+
+		self.count = 0
+
+		for column in self.columns:
+			setattr(self, "_" + column, np.zeros(capacity))
+
+		self._dimensions = np.zeros((capacity, 3))
+
+	def __len__(self):
+		return self.count
+
+	def grow(self, capacity):
+		"make room for at least capacity rows, doubling so repeated adds stay cheap"
+
+		current = len(self._temperature)
+
+		if capacity <= current:
+			return
+
+		capacity = max(capacity, 2 * current)
+
+		for column in self.columns:
+			values = np.zeros(capacity)
+			values[:self.count] = getattr(self, "_" + column)[:self.count]
+			setattr(self, "_" + column, values)
+
+		dimensions = np.zeros((capacity, 3))
+		dimensions[:self.count] = self._dimensions[:self.count]
+		self._dimensions = dimensions
+
+	def add(self, thermalObject, count=1, mass=None, temperature=None):
+		"""add count bodies of thermalObject's material.  mass and temperature may be arrays with one entry per body
+		and default to thermalObject's.  thermalObject may also be a Material record (see the materials module),
+		which needs a mass and starts at 15C by default.  returns the rows of the new bodies as a range"""
+
+		if isinstance(thermalObject, Material):
+			if mass is None:
+				raise Exception("error: bodies added from a material record need a mass")
+
+			temperature = 15 if temperature is None else temperature
+
+		self.grow(self.count + count)
+		rows = slice(self.count, self.count + count)
+
+		mass = thermalObject.mass if mass is None else mass
+		temperature = thermalObject.temperature if temperature is None else temperature
+
+		self._specificHeat[rows] = thermalObject.specificHeat
+		self._density[rows] = thermalObject.density
+		self._conductivity[rows] = thermalObject.conductivity
+		self._emissivity[rows] = thermalObject.emissivity or 0
+		self._mass[rows] = mass
+		self._thermalMass[rows] = self._specificHeat[rows] * self._mass[rows]
+		self._temperature[rows] = temperature
+
+		if not isinstance(thermalObject, Material) and np.isscalar(mass) and mass == thermalObject.mass and thermalObject.dimensions:
+			self._dimensions[rows] = thermalObject.dimensions
+		else:
+			"cubes, as ThermalObject assumes for a body given only its mass"
+			self._dimensions[rows] = np.power(self._mass[rows] / self._density[rows], 1 / 3.0)[:, None]
+
+		self.count += count
+
+		return range(rows.start, rows.stop)
+
+	def column(self, name):
+		return getattr(self, "_" + name)[:self.count]
+
+	@property
+	def temperature(self):
+		return self._temperature[:self.count]
+
+	@temperature.setter
+	def temperature(self, value):
+		self._temperature[:self.count] = value
+
+	@property
+	def mass(self):
+		return self._mass[:self.count]
+
+	@property
+	def thermalMass(self):
+		return self._thermalMass[:self.count]
+
+	@property
+	def energy(self):
+		return self.thermalMass * self.temperature
+
+	def setMass(self, rows, mass):
+		self._mass[rows] = mass
+		self._thermalMass[rows] = self._specificHeat[rows] * self._mass[rows]
+
+	def addEnergy(self, rows, energy):
+		"add energy (J) to the bodies in rows; a row may appear more than once"
+		rows = np.asarray(rows)
+		np.add.at(self._temperature, rows, np.broadcast_to(energy, rows.shape) / self._thermalMass[rows])
+
+	def body(self, row):
+		return TableBody(self, row)
+
+	def bodies(self, rows=None):
+		return [TableBody(self, row) for row in (range(self.count) if rows is None else rows)]
+
+class TableBody(ThermalObject):
+	"a ThermalObject whose state lives in a row of a MaterialTable"
+
+	__slots__ = ("table", "row")
+
+	def __init__(self, table, row):
+		object.__init__(self)
+		self.table = table
+		self.row = row
+
+	@property
+	def temperature(self):
+		return float(self.table._temperature[self.row])
+
+	@temperature.setter
+	def temperature(self, value):
+		self.table._temperature[self.row] = value
+
+	@property
+	def mass(self):
+		return float(self.table._mass[self.row])
+
+	@mass.setter
+	def mass(self, value):
+		self.table.setMass(self.row, value)
+
+	@property
+	def specificHeat(self):
+		return float(self.table._specificHeat[self.row])
+
+	@specificHeat.setter
+	def specificHeat(self, value):
+		self.table._specificHeat[self.row] = value
+		self.table.setMass(self.row, self.table._mass[self.row])
+
+	@property
+	def _thermalMass(self):
+		return float(self.table._thermalMass[self.row])
+
+	@property
+	def density(self):
+		return float(self.table._density[self.row])
+
+	@property
+	def conductivity(self):
+		return float(self.table._conductivity[self.row])
+
+	@property
+	def emissivity(self):
+		return float(self.table._emissivity[self.row])
+
+	@property
+	def dimensions(self):
+		return tuple(self.table._dimensions[self.row].tolist())
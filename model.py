@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+
+"""
+	model definitions
+
+	Describes a thermal system declaratively in JSON: parameters, bodies (a
+	material and a mass, volume or dimensions, and what fraction of the mass
+	is water that freezes), couplings between bodies (contact area, length,
+	convection), radiating and sun absorbing surfaces and boundary bodies
+	whose temperature is imposed from outside (the outside air), and
+	optionally materials of its own (see the materials module), for example
+	"materials" : "materials.json" for pex, concrete and paraffin.  A model's
+	materials are its own: they add to or replace the registered materials
+	for this model only.
+	Values are numbers or arithmetic expressions over the parameters,
+	the keys of the greenhouse file, other bodies (soilBed.volume) and the
+	material constants (density.soil), for example
+
+		"contactArea" : "pexLength(pexSurfaceArea, soilBank.volume)"
+
+	loadModel() validates a definition by evaluating all of it once.
+	Model.network() compiles it into a ThermalNetwork, with any parameter
+	replaced by one value per run, and Model.exchangeGraph() into an
+	ExchangeGraph that steps ThermalObjects.
+"""
+import ast
+import json
+import os.path
+
+import functools
+
+import materials
+import thermalobject
+from thermalobject import ThermalConstants
+
+"the classes of the built in materials; any other material in the registry (see the materials module) makes plain ThermalObjects"
+materialClasses = {
+	"water" : thermalobject.Water,
+	"soil" : thermalobject.Soil,
+	"air" : thermalobject.Air,
+	"aluminum" : thermalobject.Aluminum,
+	"glass" : thermalobject.Glass
+}
+
+def pexLength(pexSurfaceArea, soilBankVolume):
+	"contact area of the pex tubing run through a volume of soil, with its runs 0.11m apart"
+	spacing = 0.11 #m
+	return soilBankVolume / pexSurfaceArea * (spacing * 2)
+
+functions = {
+	"pexLength" : pexLength,
+	"min" : min,
+	"max" : max,
+	"abs" : abs
+}
+
+class Constants(object):
+	"density.soil and the like in expressions: a model's materials, then the constant tables (pex and the like)"
+
+	def __init__(self, table, quantity, registry):
+		object.__init__(self)
+		self.table = table
+		self.quantity = quantity
+		self.registry = registry
+
+	def __getattr__(self, name):
+		if name in self.registry:
+			return getattr(self.registry[name], self.quantity)
+
+		if hasattr(self.table, name):
+			return getattr(self.table, name)
+
+		raise Exception("error: model: no material \"{}\"".format(name))
+
+def constants(registry):
+	"the constants expressions may use, over the materials of registry"
+	return {
+		"density" : Constants(ThermalConstants.Density, "density", registry),
+		"specificHeat" : Constants(ThermalConstants.SpecificHeat, "specificHeat", registry),
+		"conductivity" : Constants(ThermalConstants.Conductivity, "conductivity", registry),
+		"emissivity" : Constants(ThermalConstants.Emissivity, "emissivity", registry)
+	}
+
+operators = {
+	ast.Add : lambda a, b: a + b,
+	ast.Sub : lambda a, b: a - b,
+	ast.Mult : lambda a, b: a * b,
+	ast.Div : lambda a, b: a / b,
+	ast.Pow : lambda a, b: a ** b,
+	ast.USub : lambda a: -a,
+	ast.UAdd : lambda a: a
+}
+
+class BodyValues(object):
+	"soilBed.mass and soilBed.volume in expressions"
+
+	def __init__(self, model, name):
+		object.__init__(self)
+		self.model = model
+		self.name = name
+
+	def __getattr__(self, attribute):
+		if attribute == "mass":
+			return self.model.bodyMass(self.name)
+		elif attribute == "volume":
+			return self.model.bodyMass(self.name) / self.model.record(self.name).density
+
+		raise Exception("error: model: bodies have a mass and a volume, not \"{}\"".format(attribute))
+
+class Model(object):
+
+	sections = ["materials", "parameters", "bodies", "couplings", "radiators", "absorbers"]
+	bodyKeys = ["material", "mass", "volume", "dimensions", "temperature", "boundary", "freezing"]
+
+	def __init__(self, definition, config=None, overrides=None, directory="."):
+		"""definition: the model as a dict.  config: the greenhouse file the model is part of, whose keys expressions may use.
+		overrides: parameter values that replace the definition's.  directory is where files the model names are"""
+		object.__init__(self)
+
+		self.definition = definition
+		self.directory = directory
+		self.config = config or {}
+		self.overrides = dict(overrides or {})
+
+		self.validate()
+
+	def validate(self):
+		"check the structure, then evaluate everything once so bad names and expressions fail on load"
+
+		for key in self.definition:
+			if key not in self.sections:
+				raise Exception("error: model: unknown section \"{}\"".format(key))
+
+		"materials: a materials data file (relative to the model's directory) or the materials themselves"
+		definitions = self.definition.get("materials", {})
+
+		if isinstance(definitions, str):
+			definitions = materials.readMaterials(os.path.join(self.directory, definitions))
+		else:
+			definitions = materials.parseMaterials(definitions)
+
+		self.materials = dict(materials.registry)
+		self.materials.update((material.name, material) for material in definitions)
+		self.constants = constants(self.materials)
+
+		self.parameters = self.definition.get("parameters", {})
+		self.bodies = self.definition.get("bodies", {})
+		self.couplings = self.definition.get("couplings", [])
+		self.radiators = self.definition.get("radiators", [])
+		self.absorbers = self.definition.get("absorbers", [])
+
+		if not self.bodies:
+			raise Exception("error: model: no bodies")
+
+		for name, body in self.bodies.items():
+			for key in body:
+				if key not in self.bodyKeys:
+					raise Exception("error: model: body \"{}\" has unknown key \"{}\"".format(name, key))
+
+			if body.get("material") not in self.materials:
+				raise Exception("error: model: body \"{}\" has material \"{}\"; expected one of {}".format(name, body.get("material"), ", ".join(sorted(self.materials))))
+
+			if len([key for key in ("mass", "volume", "dimensions") if key in body]) != 1:
+				raise Exception("error: model: body \"{}\" needs exactly one of mass, volume or dimensions".format(name))
+
+		for coupling in self.couplings:
+			self.checkKeys("coupling", coupling, ["bodies", "contactArea", "length", "convection"])
+
+			if len(coupling.get("bodies", [])) != 2:
+				raise Exception("error: model: a coupling needs two \"bodies\": {}".format(coupling))
+
+			for name in coupling["bodies"]:
+				self.checkBody(name)
+
+		for radiator in self.radiators:
+			self.checkKeys("radiator", radiator, ["body", "contactArea", "returned"])
+			self.checkBody(radiator.get("body"))
+
+		for absorber in self.absorbers:
+			self.checkKeys("absorber", absorber, ["body", "area", "efficiency"])
+			self.checkBody(absorber.get("body"))
+
+			if "area" not in absorber:
+				raise Exception("error: model: absorber of \"{}\" needs an area".format(absorber["body"]))
+
+		for name in self.overrides:
+			if name not in self.parameters:
+				raise Exception("error: model: no parameter \"{}\" to set".format(name))
+
+		self.resolved()
+
+	def checkKeys(self, kind, entry, keys):
+		for key in entry:
+			if key not in keys:
+				raise Exception("error: model: {} has unknown key \"{}\"".format(kind, key))
+
+	def checkBody(self, name):
+		if name not in self.bodies:
+			raise Exception("error: model: no body \"{}\"".format(name))
+
+	def record(self, name):
+		"the Material record of body name"
+		return self.materials[self.bodies[name]["material"]]
+
+	def material(self, name):
+		"""what builds body name: its class, or fromMaterial for materials without one.  a body with a "freezing"
+		fraction of its mass that is water freezes (see thermalobject.PhaseChange).  a fraction per run makes the
+		network's runs differ; the object is built with the first run's, as it is with the mass"""
+
+		import numpy as np
+
+		material = self.bodies[name]["material"]
+		freezing = np.ravel(self.value(self.bodies[name].get("freezing", 0)))
+
+		if freezing.any():
+			return functools.partial(thermalobject.PhaseChange, *self.record(name).constants, freezing=freezing[0])
+
+		"a built in material the model redefines is built from the model's record"
+		if material in materialClasses and self.materials[material] is materials.registry.get(material):
+			return materialClasses[material]
+
+		return functools.partial(thermalobject.fromMaterial, self.materials[material])
+
+	def value(self, expression):
+		"a number, list or expression evaluated against the model"
+
+		if isinstance(expression, str):
+			try:
+				tree = ast.parse(expression, mode="eval")
+			except SyntaxError:
+				raise Exception("error: model: can not parse \"{}\"".format(expression))
+
+			return self.evaluate(tree.body, expression)
+
+		if isinstance(expression, list):
+			return [self.value(e) for e in expression]
+
+		return expression
+
+	def evaluate(self, node, expression):
+		if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+			return node.value
+		elif isinstance(node, ast.Name):
+			return self.name(node.id)
+		elif isinstance(node, ast.BinOp) and type(node.op) in operators:
+			return operators[type(node.op)](self.evaluate(node.left, expression), self.evaluate(node.right, expression))
+		elif isinstance(node, ast.UnaryOp) and type(node.op) in operators:
+			return operators[type(node.op)](self.evaluate(node.operand, expression))
+		elif isinstance(node, ast.Subscript):
+			return self.evaluate(node.value, expression)[self.evaluate(node.slice, expression)]
+		elif isinstance(node, ast.Attribute):
+			return getattr(self.evaluate(node.value, expression), node.attr)
+		elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in functions and not node.keywords:
+			return functions[node.func.id](*[self.evaluate(a, expression) for a in node.args])
+
+		raise Exception("error: model: unsupported expression \"{}\"".format(expression))
+
+	def name(self, name):
+		if name in self.values:
+			return self.values[name]
+
+		if name in self.parameters:
+			if name in self.evaluating:
+				raise Exception("error: model: parameter \"{}\" depends on itself".format(name))
+
+			self.evaluating.add(name)
+			self.values[name] = self.value(self.parameters[name])
+			self.evaluating.discard(name)
+
+			return self.values[name]
+
+		if name in self.bodies:
+			return BodyValues(self, name)
+		if name in self.constants:
+			return self.constants[name]
+		if name in self.config and name != "model":
+			return self.config[name]
+
+		raise Exception("error: model: unknown name \"{}\"".format(name))
+
+	def bodyMass(self, name):
+		body = self.bodies[name]
+
+		if "mass" in body:
+			return self.value(body["mass"])
+
+		density = self.record(name).density
+
+		if "volume" in body:
+			return self.value(body["volume"]) * density
+
+		dimensions = self.value(body["dimensions"])
+		return dimensions[0] * dimensions[1] * dimensions[2] * density
+
+	def resolved(self, **overrides):
+		"start evaluating with parameters replaced by overrides (numbers or one value per run)"
+
+		self.values = dict(self.overrides)
+		self.values.update(overrides)
+		self.evaluating = set()
+
+		for name in self.parameters:
+			self.name(name)
+
+		for name in self.bodies:
+			self.bodyMass(name)
+			self.value(self.bodies[name].get("temperature", 0))
+			self.value(self.bodies[name].get("freezing", 0))
+
+		for entry in self.couplings + self.radiators + self.absorbers:
+			for key, expression in entry.items():
+				if key not in ("bodies", "body"):
+					self.value(expression)
+
+		return self.values
+
+	def parameter(self, name, **overrides):
+		self.resolved(**overrides)
+		return self.name(name)
+
+	def boundaries(self):
+		"names of the bodies whose temperature is imposed, by the kind of boundary (\"outside\" is the outside air)"
+		return dict((body["boundary"], name) for name, body in self.bodies.items() if "boundary" in body)
+
+	def objects(self, **overrides):
+		"a ThermalObject for every body, by name"
+		import numpy as np
+
+		self.resolved(**overrides)
+		objects = {}
+
+		for name, body in self.bodies.items():
+			mass = np.ravel(self.bodyMass(name))[0]
+			temperature = self.value(body.get("temperature", self.name("startingTemperature") if "startingTemperature" in self.parameters else 15))
+
+			if "dimensions" in body:
+				objects[name] = self.material(name)(dimensions=tuple(self.value(body["dimensions"])), temperature=temperature)
+			else:
+				objects[name] = self.material(name)(mass=mass, temperature=temperature)
+
+		return objects
+
+	def coupling(self, a, b):
+		"the coupling between bodies a and b, evaluated"
+
+		for coupling in self.couplings:
+			if sorted(coupling["bodies"]) == sorted([a, b]):
+				return dict((key, expression if key == "bodies" else self.value(expression)) for key, expression in coupling.items())
+
+		raise Exception("error: model: \"{}\" and \"{}\" are not coupled".format(a, b))
+
+	def build(self, target):
+		"add the model's absorbers, couplings and radiators to a ThermalNetwork or ExchangeGraph, in the order they are defined"
+
+		for absorber in self.absorbers:
+			target.absorb(absorber["body"], self.value(absorber["area"]), self.value(absorber.get("efficiency", 1)))
+
+		for coupling in self.couplings:
+			a, b = coupling["bodies"]
+			target.couple(a, b, self.value(coupling.get("contactArea")), length=self.value(coupling.get("length", 1)), convection=coupling.get("convection", False))
+
+		for radiator in self.radiators:
+			target.radiate(radiator["body"], self.value(radiator.get("contactArea")), returned=self.value(radiator.get("returned", 0)))
+
+		target.compile()
+
+		return target
+
+	def network(self, runs=1, objects=None, **overrides):
+		"""compile the model into a ThermalNetwork with runs runs.  an override may hold one value per run,
+		which makes every mass and coefficient that depends on it a per-run array.
+		objects replaces the ThermalObjects built for the bodies by name, to step existing ones"""
+		from thermalnetwork import ThermalNetwork
+
+		built = self.objects(**overrides)
+		built.update(objects or {})
+		network = ThermalNetwork(runs=runs)
+
+		for name, body in self.bodies.items():
+			network.addBody(name, built[name], mass=self.bodyMass(name), fixed="boundary" in body, freezing=self.value(body.get("freezing", 0)))
+
+		return self.build(network)
+
+	def exchangeGraph(self, objects=None, **overrides):
+		"""compile the model into an ExchangeGraph over ThermalObjects (see the exchangegraph module), which steps
+		the objects themselves one exchange at a time.  the graph's bodies are its objects, by name"""
+		import numpy as np
+		from exchangegraph import ExchangeGraph
+
+		self.resolved(**overrides)
+
+		for name, body in self.bodies.items():
+			if np.ndim(self.value(body.get("freezing", 0))):
+				raise Exception("error: model: body \"{}\" freezes differently in every run, which only a network can step".format(name))
+
+		built = self.objects(**overrides)
+		built.update(objects or {})
+		graph = ExchangeGraph()
+
+		for name, body in self.bodies.items():
+			graph.addBody(name, built[name], fixed="boundary" in body)
+
+		return self.build(graph)
+
+def loadModel(filename, overrides=None):
+	"""a Model from a model file, or from a greenhouse file whose "model" is {"definition" : model file or inline definition, "parameters" : {...}}.
+	the greenhouse file's parameters and overrides replace the model's own"""
+
+	with open(filename, "r") as f:
+		config = json.loads(f.read())
+
+	directory = os.path.dirname(filename)
+
+	if "model" not in config:
+		return Model(config, overrides=overrides, directory=directory)
+
+	model = config["model"]
+	definition = model.get("definition")
+
+	if isinstance(definition, str):
+		with open(os.path.join(directory, definition), "r") as f:
+			definition = json.loads(f.read())
+
+	if not isinstance(definition, dict):
+		raise Exception("error: model: {} has no model definition".format(filename))
+
+	"the greenhouse file's parameters are expressions too, over the model and the greenhouse file"
+	definition = dict(definition)
+	definition["parameters"] = dict(definition.get("parameters", {}))
+	definition["parameters"].update(model.get("parameters", {}))
+
+	return Model(definition, config, overrides, directory)
+
+if __name__ == "__main__":
+
+	import argparse
+
+	parser = argparse.ArgumentParser()
+	parser.add_argument("model", help="model file, or greenhouse file with a model", type=str)
+	args = parser.parse_args()
+
+	model = loadModel(args.model)
+	values = model.resolved()
+
+	print("parameters:")
+	for name in sorted(model.parameters):
+		print("  {} = {}".format(name, values[name]))
+
+	print("bodies:")
+	for name in model.bodies:
+		print("  {} ({}): {}g".format(name, model.bodies[name]["material"], model.bodyMass(name)))
+
+	network = model.network()
+	print("compiled {} bodies, {} couplings".format(len(network.index), len(model.couplings)))
@@ -0,0 +1,167 @@
+"""
+	profiling
+
+	Opt-in instrumentation for simulations.  A Profiler wraps the functions of
+	each phase of a simulation (solar, weather, exchange, radiation, I/O) with
+	timers and call counters, tracks simulated seconds per wall clock second,
+	prints a report every so often and can run cProfile over a window of
+	simulated days, dumping a pstats file.  Days prepared by day pipeline
+	workers are computed in other processes: their time is reported as
+	"workers", CPU time alongside the other phases rather than part of this
+	process's wall clock.  Searches that simulate the same
+	days again (every pass of the soil bank search) add every visit of the
+	window to the one profile.  Nothing is wrapped until install()
+	and everything is put back by close(), so a simulation that is not being
+	profiled pays only a "profiler is None" check once per simulated day.
+"""
+import cProfile
+import sys
+import time
+
+class Profiler(object):
+
+	def __init__(self, report=60, window=None, dump="profile.pstats", stream=None):
+		"""report: wall clock seconds between reports (None for a report at the end only).
+		window: (first, last) simulated days to run cProfile over, written to dump"""
+		object.__init__(self)
+
+		self.reportInterval = report
+		self.window = window
+		self.dump = dump
+		self.stream = stream or sys.stdout
+
+		self.phases = {}
+		self.installed = []
+
+		self.started = time.perf_counter()
+		self.nextReport = self.started + (report or 0)
+		self.simulated = 0
+		self.days = 0
+
+		self.profile = None
+		self.profiling = False
+
+	def instrument(self, owner, name, phase):
+		"time every call of owner.name (a function of a module or a method of a class) as part of phase"
+
+		original = getattr(owner, name)
+		totals = self.phases.setdefault(phase, [0.0, 0])
+		clock = time.perf_counter
+
+		def timed(*args, **kwargs):
+			start = clock()
+			try:
+				return original(*args, **kwargs)
+			finally:
+				totals[0] += clock() - start
+				totals[1] += 1
+
+		timed.__wrapped__ = original
+		timed.__doc__ = original.__doc__
+
+		setattr(owner, name, timed)
+		self.installed.append((owner, name, original))
+
+	def account(self, owner, name, phase):
+		"""count the seconds passed to every call of owner.name(seconds) as part of phase, for time spent out of
+		this process's sight (in worker processes)"""
+
+		original = getattr(owner, name)
+		totals = self.phases.setdefault(phase, [0.0, 0])
+
+		def counted(target, seconds):
+			totals[0] += seconds
+			totals[1] += 1
+			return original(target, seconds)
+
+		counted.__wrapped__ = original
+		counted.__doc__ = original.__doc__
+
+		setattr(owner, name, counted)
+		self.installed.append((owner, name, original))
+
+	def install(self, geothermal):
+		"instrument the phases of the geothermal module's simulations and the classes they use"
+		from thermalobject import ThermalObject
+		from recorder import Recorder
+		from checkpoint import Checkpoints
+		from thermalnetwork import ThermalNetwork
+		from exchangegraph import ExchangeGraph
+		from daypipeline import DayPipeline
+
+		self.instrument(geothermal, "dailyInputs", "solar")
+		self.instrument(geothermal, "weatherDay", "weather")
+		self.instrument(geothermal, "prefetchWeather", "weather")
+		self.instrument(DayPipeline, "next", "inputs")
+		self.account(DayPipeline, "prepared", "workers")
+		self.instrument(ThermalObject, "transferTo", "exchange")
+		self.instrument(ThermalObject, "radiate", "radiation")
+		self.instrument(ExchangeGraph, "exchange", "exchange")
+		self.instrument(ExchangeGraph, "radiation", "radiation")
+		self.instrument(Recorder, "flush", "io")
+		self.instrument(Checkpoints, "save", "io")
+
+		self.instrument(ThermalNetwork, "step", "network")
+		self.instrument(ThermalNetwork, "advance", "network")
+
+	def uninstall(self):
+		for owner, name, original in reversed(self.installed):
+			setattr(owner, name, original)
+
+		self.installed = []
+
+	def day(self, day):
+		"call at the start of every simulated day: counts simulated time, runs the cProfile window and reports"
+
+		if self.days:
+			self.simulated += 86400
+		self.days += 1
+
+		if self.window:
+			first, last = self.window
+			inside = first <= day <= last
+
+			if inside and not self.profiling:
+				self.profile = self.profile or cProfile.Profile()
+				self.profile.enable()
+				self.profiling = True
+			elif not inside and self.profiling:
+				self.stopProfile()
+
+		if self.reportInterval and time.perf_counter() >= self.nextReport:
+			self.report()
+			self.nextReport = time.perf_counter() + self.reportInterval
+
+	def stopProfile(self):
+		"pause the profile and write everything it has gathered so far"
+		self.profile.disable()
+		self.profiling = False
+		self.profile.dump_stats(self.dump)
+		self.stream.write("profile of days {} to {} written to {}\n".format(self.window[0], self.window[1], self.dump))
+
+	def rate(self):
+		"simulated seconds per wall clock second"
+		return self.simulated / max(time.perf_counter() - self.started, 1e-9)
+
+	def report(self):
+		wall = time.perf_counter() - self.started
+
+		self.stream.write("{:.0f}s simulated in {:.1f}s: {:.0f} simulated seconds per second\n".format(self.simulated, wall, self.rate()))
+
+		for phase, (seconds, calls) in sorted(self.phases.items(), key=lambda item: -item[1][0]):
+			if calls:
+				self.stream.write("  {:<10} {:9.2f}s {:6.1%} {:12d} calls {:9.3f}us/call\n".format(phase, seconds, seconds / max(wall, 1e-9), calls, seconds / calls * 1e6))
+
+		self.stream.flush()
+
+	def close(self):
+		"count the last simulated day, finish the cProfile window, report and remove the instrumentation"
+
+		if self.days:
+			self.simulated += 86400
+
+		if self.profiling:
+			self.stopProfile()
+
+		self.report()
+		self.uninstall()
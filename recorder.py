@@ -0,0 +1,141 @@
+"""
+	recorder
+
+	Streams simulation state to disk.  Every 'every'th sample of a set of named
+	variables is copied into a preallocated chunk of rows, and full chunks are
+	written as one .npy file per variable (directory/<variable>/NNNNNN.npy), so
+	a year of traces costs one chunk of memory and a handful of bulk writes.
+	loadRecording() reads a recording back as one array per variable.
+"""
+import json
+import os.path
+import numpy as np
+
+class Recorder(object):
+	"""variables is a list of names, or a list of (name, shape) for variables with more than one value per sample
+	(one per run, for example).  every sample also records a float64 "time" column"""
+
+	def __init__(self, directory, variables, every=60, chunkSize=4096, dtype="float32", append=False):
+		object.__init__(self)
+
+		self.directory = directory
+		self.every = every
+		self.chunkSize = chunkSize
+		self.dtype = dtype
+
+		self.variables = [(v, ()) if isinstance(v, str) else (v[0], tuple(v[1])) for v in variables]
+
+		manifest = os.path.join(directory, "recorder.json")
+		self.chunks = 0
+		self.total = 0
+
+		if os.path.isfile(manifest):
+			if not append:
+				raise Exception("error: {} already holds a recording".format(directory))
+
+			with open(manifest, "r") as f:
+				existing = json.loads(f.read())
+
+			if [[name, list(shape)] for name, shape in self.variables] != existing["variables"]:
+				raise Exception("error: can not append different variables to the recording in {}".format(directory))
+
+			self.chunks = existing["chunks"]
+			self.total = existing["rows"]
+
+		for name in ["time"] + [name for name, shape in self.variables]:
+			if not os.path.isdir(os.path.join(directory, name)):
+				os.makedirs(os.path.join(directory, name))
+
+		self.time = np.zeros(chunkSize)
+		self.buffers = [np.zeros((chunkSize,) + shape, dtype=dtype) for name, shape in self.variables]
+		self.rows = 0
+
+		"record the first sample offered"
+		self.counter = 1
+
+	def due(self):
+		"""count a sample; True for every 'every'th one, which should then be passed to record().
+		checking first means skipped samples cost nothing to gather"""
+
+		self.counter -= 1
+
+		if self.counter:
+			return False
+
+		self.counter = self.every
+		return True
+
+	def record(self, time, *values):
+		"store one sample: the time and a value for every variable, in order"
+
+		row = self.rows
+		self.time[row] = time
+
+		for buffer, value in zip(self.buffers, values):
+			buffer[row] = value
+
+		self.rows += 1
+
+		if self.rows == self.chunkSize:
+			self.flush()
+
+	def writeColumn(self, name, values):
+		filename = os.path.join(self.directory, name, "{:06d}.npy".format(self.chunks))
+
+		with open(filename + ".partial", "wb") as f:
+			np.save(f, values)
+
+		os.replace(filename + ".partial", filename)
+
+	def flush(self):
+		"write the rows buffered so far as the next chunk"
+
+		if not self.rows:
+			return
+
+		self.writeColumn("time", self.time[:self.rows])
+
+		for (name, shape), buffer in zip(self.variables, self.buffers):
+			self.writeColumn(name, buffer[:self.rows])
+
+		self.chunks += 1
+		self.total += self.rows
+		self.rows = 0
+
+		manifest = os.path.join(self.directory, "recorder.json")
+
+		with open(manifest + ".partial", "w") as f:
+			f.write(json.dumps({
+				"variables" : [[name, list(shape)] for name, shape in self.variables],
+				"every" : self.every,
+				"dtype" : self.dtype,
+				"chunks" : self.chunks,
+				"rows" : self.total
+			}))
+
+		os.replace(manifest + ".partial", manifest)
+
+	def close(self):
+		self.flush()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exception):
+		self.close()
+
+def loadRecording(directory, variables=None):
+	"dict of the recording's time and variables (or just the named ones), each concatenated over all chunks"
+
+	with open(os.path.join(directory, "recorder.json"), "r") as f:
+		manifest = json.loads(f.read())
+
+	names = ["time"] + [name for name, shape in manifest["variables"]]
+
+	if variables:
+		names = [name for name in names if name in variables or name == "time"]
+
+	if not manifest["chunks"]:
+		return dict((name, np.zeros(0)) for name in names)
+
+	return dict((name, np.concatenate([np.load(os.path.join(directory, name, "{:06d}.npy".format(chunk))) for chunk in range(manifest["chunks"])])) for name in names)
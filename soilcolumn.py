@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+
+"""
+	soil column
+
+	A soil volume split into cells instead of one lumped body: SoilColumn stacks
+	layers along the depth, SoilGrid also splits the length into columns.
+	Conduction between cells is solved implicitly (backward euler).  The
+	tridiagonal system of each direction is factorized once per step size and
+	solved with sweeps that are O(n) along it and vectorized over the other
+	axis, so any number of cells and any step size stay stable without Python
+	work per cell.
+
+	Both are ThermalObjects that exchange energy through their surface layer, so
+	they take the place of a lumped Soil in transferTo and radiate; layer(i)
+	gives the same interface for a layer further down (for example where tubing
+	is buried).  step(seconds) conducts heat between the cells.
+"""
+import numpy as np
+
+from thermalobject import ThermalObject, ThermalConstants
+
+class TridiagonalSolver(object):
+	"""solves A x = rhs along the first axis of rhs for a fixed tridiagonal A (Thomas algorithm).  A is factorized
+	once, so each solve is one forward and one backward sweep, O(n), each row vectorized over the other axes of rhs;
+	lower[0] and upper[-1] are outside A and ignored"""
+
+	def __init__(self, lower, diagonal, upper):
+		object.__init__(self)
+
+		n = len(diagonal)
+		lower = np.asarray(lower, dtype=float)
+		self.upper = np.zeros(n)
+		self.scale = np.zeros(n)
+
+		denominator = diagonal[0]
+		self.scale[0] = 1 / denominator
+		for i in range(1, n):
+			self.upper[i - 1] = upper[i - 1] / denominator
+			denominator = diagonal[i] - lower[i] * self.upper[i - 1]
+			self.scale[i] = 1 / denominator
+
+		"x[i] = rhs[i] * scale[i] - factor[i] * x[i - 1] in the forward sweep"
+		self.factor = lower * self.scale
+
+		"plain floats for a single column, where numpy's per-row overhead would dominate"
+		self.coefficients = (self.factor.tolist(), self.upper.tolist())
+
+	def solve(self, rhs):
+		rhs = np.asarray(rhs, dtype=float)
+		x = self.scale.reshape((-1,) + (1,) * (rhs.ndim - 1)) * rhs
+
+		if x.size == len(x):
+			return np.array(self.sweep(x.ravel().tolist())).reshape(x.shape)
+
+		for i in range(1, len(x)):
+			x[i] -= self.factor[i] * x[i - 1]
+
+		for i in range(len(x) - 2, -1, -1):
+			x[i] -= self.upper[i] * x[i + 1]
+
+		return x
+
+	def sweep(self, x):
+		"solve() for one column as a list of floats, in place"
+		factor, upper = self.coefficients
+
+		for i in range(1, len(x)):
+			x[i] -= factor[i] * x[i - 1]
+
+		for i in range(len(x) - 2, -1, -1):
+			x[i] -= upper[i] * x[i + 1]
+
+		return x
+
+def conductionSolver(conductance, capacity, seconds, n, boundary=0):
+	"""backward euler system for a row of n equal cells: capacity/seconds * T' - conductance * (neighbours' T' - T') = capacity/seconds * T,
+	plus a conductance 'boundary' from the last cell to a fixed temperature"""
+
+	diagonal = np.full(n, capacity / seconds + 2 * conductance)
+	diagonal[0] -= conductance
+	diagonal[-1] += boundary - conductance
+
+	lower = np.full(n, -conductance)
+	upper = np.full(n, -conductance)
+
+	return TridiagonalSolver(lower, diagonal, upper)
+
+class SoilLayer(ThermalObject):
+	"""ThermalObject view of one layer of a SoilGrid.  its temperature is the layer's mean
+	and energy added to it is spread evenly over the layer's cells"""
+
+	__slots__ = ("grid", "index")
+
+	def __init__(self, grid, index):
+		object.__init__(self)
+		self.grid = grid
+		self.index = index
+
+	@property
+	def temperature(self):
+		return float(self.grid.temperatures[self.index].mean())
+
+	@temperature.setter
+	def temperature(self, value):
+		row = self.grid.temperatures[self.index]
+		row += value - row.mean()
+
+	@property
+	def _thermalMass(self):
+		return self.grid.cellThermalMass * self.grid.cells
+
+	@property
+	def mass(self):
+		return self.grid.mass / self.grid.layers
+
+	@property
+	def specificHeat(self):
+		return self.grid.specificHeat
+
+	@property
+	def density(self):
+		return self.grid.density
+
+	@property
+	def conductivity(self):
+		return self.grid.conductivity
+
+	@property
+	def emissivity(self):
+		return self.grid.emissivity
+
+	@property
+	def dimensions(self):
+		length, width, depth = self.grid.dimensions
+		return (length, width, depth / self.grid.layers)
+
+class SoilGrid(ThermalObject):
+	"""soil of dimensions (length, width, depth) split into 'layers' along the depth and 'cells' along the length.
+	temperatures[layer, cell] starts at temperature, which may also be one value per layer.
+	the sides are insulated; the bottom is too unless deepTemperature holds it against ground at that temperature.
+	as a ThermalObject it is its surface layer (layer 0), apart from energy and mass which cover the whole grid"""
+
+	def __init__(self, dimensions, layers=10, cells=1, temperature=15, deepTemperature=None, specificHeat=ThermalConstants.SpecificHeat.soil, density=ThermalConstants.Density.soil, conductivity=ThermalConstants.Conductivity.soil, emissivity=ThermalConstants.Emissivity.soil):
+		object.__init__(self)
+
+		self._specificHeat = specificHeat
+		self.density = density
+		self.conductivity = conductivity
+		self.emissivity = emissivity
+		self.dimensions = tuple(dimensions)
+
+		self.layers = layers
+		self.cells = cells
+		self.deepTemperature = deepTemperature
+
+		length, width, depth = self.dimensions
+		self._mass = length * width * depth * density
+
+		self.cellThermalMass = self._mass * specificHeat / (layers * cells)
+
+		"conductance between vertically and horizontally neighbouring cells and from the bottom cells to the ground below"
+		self.verticalConductance = conductivity * (length / cells) * width / (depth / layers)
+		self.horizontalConductance = conductivity * (depth / layers) * width / (length / cells)
+		self.boundaryConductance = 0 if deepTemperature is None else 2 * self.verticalConductance
+
+		self.temperatures = np.empty((layers, cells))
+		self.temperatures[:] = np.reshape(temperature, (-1, 1)) if np.ndim(temperature) else temperature
+
+		self._solvers = {}
+
+	@property
+	def surface(self):
+		return self.layer(0)
+
+	def layer(self, index):
+		return SoilLayer(self, index)
+
+	@property
+	def temperature(self):
+		return float(self.temperatures[0].mean())
+
+	@temperature.setter
+	def temperature(self, value):
+		row = self.temperatures[0]
+		row += value - row.mean()
+
+	@property
+	def _thermalMass(self):
+		return self.cellThermalMass * self.cells
+
+	@property
+	def mass(self):
+		return self._mass
+
+	@property
+	def thermalMass(self):
+		return self.cellThermalMass * self.layers * self.cells
+
+	@property
+	def energy(self):
+		return self.cellThermalMass * float(self.temperatures.sum())
+
+	@energy.setter
+	def energy(self, value):
+		self.addEnergy(value - self.energy)
+
+	@property
+	def meanTemperature(self):
+		return float(self.temperatures.mean())
+
+	@property
+	def profile(self):
+		"mean temperature of every layer from the surface down"
+		return self.temperatures.mean(axis=1)
+
+	def solvers(self, seconds):
+		if seconds not in self._solvers:
+			vertical = conductionSolver(self.verticalConductance, self.cellThermalMass, seconds, self.layers, self.boundaryConductance)
+			horizontal = conductionSolver(self.horizontalConductance, self.cellThermalMass, seconds, self.cells) if self.cells > 1 else None
+			self._solvers[seconds] = (vertical, horizontal)
+
+		return self._solvers[seconds]
+
+	def step(self, seconds=1):
+		"""conduct heat between cells for seconds.  implicit, so stable for any step.
+		the two directions are solved one after the other (operator splitting)"""
+
+		vertical, horizontal = self.solvers(seconds)
+		scale = self.cellThermalMass / seconds
+
+		rhs = scale * self.temperatures
+		if self.boundaryConductance:
+			rhs[-1] += self.boundaryConductance * self.deepTemperature
+
+		self.temperatures = vertical.solve(rhs)
+
+		if horizontal:
+			self.temperatures = horizontal.solve(scale * self.temperatures.T).T
+
+class SoilColumn(SoilGrid):
+	"a SoilGrid of layers only"
+
+	def __init__(self, dimensions, layers=10, temperature=15, deepTemperature=None, **properties):
+		SoilGrid.__init__(self, dimensions, layers, 1, temperature, deepTemperature, **properties)
+
+def geothermalBank(config="redhouse.json", layers=20, cells=1, temperature=15, deepTemperature=None):
+	"the geothermal bank of a greenhouse configuration file (geothermal_dimensions is length x width x depth in m)"
+	import json
+
+	with open(config, "r") as f:
+		dimensions = json.loads(f.read())["geothermal_dimensions"]
+
+	return SoilGrid(dimensions, layers, cells, temperature, deepTemperature)
+
+if __name__ == "__main__":
+
+	import argparse
+	import math
+	from thermalobject import Air
+
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--greenhouse", help="greenhouse characteristics file", default="redhouse.json", type=str)
+	parser.add_argument("--layers", help="number of layers", default=20, type=int)
+	parser.add_argument("--temperature", help="starting soil temperature in C", default=15, type=float)
+	parser.add_argument("--deep", help="temperature of the ground below the bank in C; insulated if not given", default=None, type=float)
+	parser.add_argument("--air", help="mean air temperature above the bank in C", default=0, type=float)
+	parser.add_argument("--swing", help="daily swing of the air temperature in C", default=10, type=float)
+	parser.add_argument("--days", help="days to simulate", default=7, type=int)
+	parser.add_argument("--step", help="conduction step in seconds", default=60, type=int)
+	args = parser.parse_args()
+
+	bank = geothermalBank(args.greenhouse, args.layers, temperature=args.temperature, deepTemperature=args.deep)
+	air = Air(mass=1e15, temperature=args.air)
+	area = bank.dimensions[0] * bank.dimensions[1]
+
+	for second in range(0, args.days * 86400, args.step):
+		air.temperature = args.air + args.swing / 2 * math.sin(2 * math.pi * second / 86400)
+		bank.transferTo(air, area, time=args.step)
+		bank.step(args.step)
+
+	depth = bank.dimensions[2]
+	for i, t in enumerate(bank.profile):
+		print("{:6.2f}m  {:7.3f}C".format((i + 0.5) * depth / bank.layers, t))
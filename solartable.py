@@ -0,0 +1,162 @@
+"""
+	solar table
+
+	Solar altitude and direct radiation for a whole year at a site, computed
+	once as a vectorized batch and cached on disk as a memory-mapped array
+	in solar/.  Replaces per-second pysolar calls in the simulations.
+
+	Times are naive datetimes in UTC, the same convention pysolar uses.
+"""
+from datetime import datetime, timedelta
+import math
+import os
+import tempfile
+import numpy as np
+
+"pysolar's refraction correction constants (NREL SPA defaults)"
+standardPressure = 101325.0 # pascals
+standardTemperature = 288.15 # kelvin
+
+def solarAltitude(latitude, longitude, seconds):
+	"""vectorized solar altitude in degrees for an array of UTC unix timestamps (NOAA solar position algorithm),
+	with the same atmospheric refraction correction as pysolar.solar.get_altitude"""
+
+	jd = np.asarray(seconds, dtype=float) / 86400.0 + 2440587.5
+	t = (jd - 2451545.0) / 36525.0
+
+	meanLongitude = np.radians(np.mod(280.46646 + t * (36000.76983 + t * 0.0003032), 360))
+	meanAnomaly = np.radians(357.52911 + t * (35999.05029 - 0.0001537 * t))
+	eccentricity = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+
+	center = np.sin(meanAnomaly) * (1.914602 - t * (0.004817 + 0.000014 * t)) + np.sin(2 * meanAnomaly) * (0.019993 - 0.000101 * t) + np.sin(3 * meanAnomaly) * 0.000289
+	omega = np.radians(125.04 - 1934.136 * t)
+	apparentLongitude = meanLongitude + np.radians(center - 0.00569 - 0.00478 * np.sin(omega))
+
+	meanObliquity = 23 + (26 + (21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))) / 60) / 60
+	obliquity = np.radians(meanObliquity + 0.00256 * np.cos(omega))
+
+	declination = np.arcsin(np.sin(obliquity) * np.sin(apparentLongitude))
+
+	y = np.tan(obliquity / 2) ** 2
+	equationOfTime = 4 * np.degrees(y * np.sin(2 * meanLongitude) - 2 * eccentricity * np.sin(meanAnomaly) + 4 * eccentricity * y * np.sin(meanAnomaly) * np.cos(2 * meanLongitude) - 0.5 * y * y * np.sin(4 * meanLongitude) - 1.25 * eccentricity * eccentricity * np.sin(2 * meanAnomaly)) #minutes
+
+	solarTime = np.mod(np.asarray(seconds, dtype=float), 86400) / 60.0 + equationOfTime + 4 * longitude #minutes
+	hourAngle = np.radians(solarTime / 4 - 180)
+
+	lat = math.radians(latitude)
+	altitude = np.degrees(np.arcsin(np.clip(math.sin(lat) * np.sin(declination) + math.cos(lat) * np.cos(declination) * np.cos(hourAngle), -1, 1)))
+
+	"refraction, only applied when the sun is not well below the horizon"
+	visible = altitude >= -(0.26667 + 0.5667)
+	refraction = standardPressure * 2.830 * 1.02 / (1010.0 * standardTemperature * 60.0 * np.tan(np.radians(altitude + 10.3 / (altitude + 5.11))))
+
+	return np.where(visible, altitude + refraction, altitude)
+
+def radiationDirect(seconds, altitude):
+	"vectorized pysolar.radiation.get_radiation_direct; zero while the sun is below the horizon"
+
+	when = np.asarray(seconds, dtype=np.int64).astype("datetime64[s]")
+	day = (when.astype("datetime64[D]") - when.astype("datetime64[Y]")).astype(int) + 1
+
+	flux = 1160 + (75 * np.sin(2 * math.pi / 365 * (day - 275)))
+	opticalDepth = 0.174 + (0.035 * np.sin(2 * math.pi / 365 * (day - 100)))
+
+	up = altitude > 0
+	airMassRatio = 1 / np.sin(np.radians(np.where(up, altitude, 90)))
+
+	return np.where(up, flux * np.exp(-1 * opticalDepth * airMassRatio), 0)
+
+def timestamp(date):
+	"naive UTC datetime to unix seconds"
+	return (date - datetime(1970, 1, 1)).total_seconds()
+
+class SolarTable(object):
+	"""altitude and direct radiation for every 'resolution' seconds of a year at (latitude, longitude).
+	the table is computed once and kept in directory as a float32 .npy file that is memory mapped on load"""
+
+	def __init__(self, latitude, longitude, year, resolution=60, directory="solar"):
+		object.__init__(self)
+
+		self.latitude = latitude
+		self.longitude = longitude
+		self.year = year
+		self.resolution = resolution
+		self.start = timestamp(datetime(year, 1, 1))
+
+		self.filename = os.path.join(directory, "solar_{0}_{1}_{2}_{3}.npy".format(round(latitude, 6), round(longitude, 6), year, resolution))
+
+		if not os.path.isfile(self.filename):
+			self.build(directory)
+
+		table = np.load(self.filename, mmap_mode="r")
+
+		self.altitude = table[0]
+		self.radiation = table[1]
+
+	def build(self, directory):
+		"one extra sample past the end of the year so the last interval can be interpolated"
+		seconds = timestamp(datetime(self.year + 1, 1, 1)) - self.start
+		times = self.start + np.arange(0, seconds + self.resolution, self.resolution, dtype=np.int64)
+
+		altitude = solarAltitude(self.latitude, self.longitude, times)
+		radiation = radiationDirect(times, altitude)
+
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+
+		"""write to a file of this process's own next to the final name and rename, so a half written table is never
+		picked up and processes building the same table at once do not write over each other"""
+		with tempfile.NamedTemporaryFile(dir=directory or ".", suffix=".partial.npy", delete=False) as partial:
+			np.save(partial, np.array([altitude, radiation], dtype=np.float32))
+
+		os.replace(partial.name, self.filename)
+
+	def sample(self, start, seconds, step=1):
+		"""altitude and direct radiation every step seconds for 'seconds' seconds from the datetime start,
+		linearly interpolated between table entries.  start must be in the table's year"""
+
+		offset = timestamp(start) - self.start
+		position = (offset + np.arange(0, seconds, step, dtype=float)) / self.resolution
+
+		first = int(math.floor(position[0]))
+		last = min(int(math.ceil(position[-1])) + 1, len(self.altitude))
+		index = np.arange(first, last)
+
+		altitude = np.interp(position, index, self.altitude[first:last])
+		radiation = np.interp(position, index, self.radiation[first:last])
+
+		"the sun has set wherever the interpolated altitude is below the horizon"
+		radiation[altitude <= 0] = 0
+
+		return altitude, radiation
+
+_tables = {}
+
+def solarTable(latitude, longitude, year, resolution=60, directory="solar"):
+	"shared SolarTable instance so repeated runs and retries in one process reuse the same mapping"
+
+	key = (latitude, longitude, year, resolution, directory)
+
+	if key not in _tables:
+		_tables[key] = SolarTable(latitude, longitude, year, resolution, directory)
+
+	return _tables[key]
+
+def solarWindow(latitude, longitude, start, seconds, step=1, resolution=60, directory="solar"):
+	"altitude and direct radiation every step seconds from start, crossing into following years as needed"
+
+	altitudes = []
+	radiations = []
+
+	while seconds > 0:
+		yearEnd = datetime(start.year + 1, 1, 1)
+		span = min(seconds, int(math.ceil((yearEnd - start).total_seconds() / step)) * step)
+
+		altitude, radiation = solarTable(latitude, longitude, start.year, resolution, directory).sample(start, span, step)
+		altitudes.append(altitude)
+		radiations.append(radiation)
+
+		start += timedelta(seconds = span)
+		seconds -= span
+
+	return np.concatenate(altitudes), np.concatenate(radiations)
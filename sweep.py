@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+"""
+	parameter sweeps
+
+	Runs one of the design tools over every point of a parameter grid on a
+	process pool.  Finished points are appended to a cache file as they
+	complete, so an interrupted sweep picks up where it stopped, and all
+	results are collected into a single table.  A cached point is only
+	reused while the tool's defaults and source files are what they were
+	when it ran.
+"""
+import csv
+import functools
+import hashlib
+import itertools
+import json
+import os.path
+from multiprocessing import Pool
+
+from materials import ThermalConstants
+
+def grid(**parameters):
+	"every combination of the given parameter values.  values that are not lists are held fixed"
+
+	names = sorted(parameters)
+	values = [parameters[name] if isinstance(parameters[name], (list, tuple)) else [parameters[name]] for name in names]
+
+	return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+"the parameters every tool's points start from"
+defaults = {
+	"soilbank" : {
+		"water_mass" : 0.20819755 * ThermalConstants.Density.water,
+		"water_surface_area" : 0.74322432,
+		"soil_bed_mass" : 424753,
+		"soil_bed_surface_area" : 3.6576 * 0.4572,
+		"minimum_temperature" : 0,
+		"starting_temperature" : 15,
+		"greenhouse_dimensions" : [4.8768, 1.8288, 2.7432],
+		"insulation_thickness" : 0.127,
+		"year" : 2015,
+		"tolerance" : None
+	},
+	"tube" : {
+		"tube_diameter" : 0.0127,
+		"flow_rate" : 0.22,
+		"max_tube_length" : 100000,
+		"energy_to_sink" : 1000,
+		"transfer_medium" : "water",
+		"setpoint" : 32,
+		"geothermal_temp" : 15
+	},
+	"ldsprep" : {
+		"air" : 0,
+		"soil" : 9,
+		"water" : 9
+	}
+}
+
+"the files whose contents decide a tool's results"
+sources = {
+	"soilbank" : ["geothermal.py", "soilbank.json", "model.py", "thermalnetwork.py", "thermalobject.py", "materials.py", "solartable.py", "weatherstore.py"],
+	"tube" : ["tube_length_calc.py", "thermalobject.py", "materials.py"],
+	"ldsprep" : ["ldsprepper.py", "ldsprepper.json", "model.py", "thermalobject.py", "materials.py"]
+}
+
+def resolve(tool, point):
+	"a point with the tool's defaults filled in"
+	p = dict(defaults[tool])
+	p.update(point)
+	return p
+
+@functools.lru_cache(maxsize=None)
+def fingerprint(tool):
+	"digest of the tool's source files"
+	digest = hashlib.md5()
+
+	for name in sources[tool]:
+		with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), "rb") as f:
+			digest.update(f.read())
+
+	return digest.hexdigest()
+
+def soilBankPoint(point):
+	"geothermal.findSoilBankArea on the array engine"
+	import geothermal
+
+	p = resolve("soilbank", point)
+
+	mass = geothermal.findSoilBankArea(p["water_mass"], p["water_surface_area"], p["soil_bed_mass"], p["soil_bed_surface_area"], p["minimum_temperature"], p["greenhouse_dimensions"], startingTemperature=p["starting_temperature"], year=p["year"], engine="array", tolerance=p["tolerance"], insulationThickness=p["insulation_thickness"])
+
+	return {"soil_bank_mass" : float(mass)}
+
+def tubePoint(point):
+	"""tube_length_calc.cooling_loop.  the diameter, medium, setpoint and geothermal temperature default as in its command line;
+	the command line works the energy and flow rate out from a greenhouse file, so a sweep defaults them to 1000J and 3.5gpm
+	(0.22l/s), and caps the tube at 100km instead of its 10^11m"""
+	from tube_length_calc import cooling_loop
+	from thermalobject import Water, Air, c_to_kelvin
+
+	p = resolve("tube", point)
+
+	medium = Air if p["transfer_medium"] == "air" else Water
+	transfer_medium = medium(mass=1, temperature=c_to_kelvin(p["setpoint"]))
+
+	return cooling_loop(transfer_medium, p["energy_to_sink"], p["max_tube_length"], p["tube_diameter"], c_to_kelvin(p["geothermal_temp"]), p["flow_rate"])
+
+def ldsprepPoint(point):
+	"ldsprepper.prep"
+	from ldsprepper import prep
+
+	p = resolve("ldsprep", point)
+
+	return prep(p["air"], p["soil"], p["water"])
+
+tools = {
+	"soilbank" : soilBankPoint,
+	"tube" : tubePoint,
+	"ldsprep" : ldsprepPoint
+}
+
+def pointKey(tool, point):
+	"the point with every default filled in, and the tool's source, so changing either runs the point again"
+	return json.dumps([tool, resolve(tool, point), fingerprint(tool)], sort_keys=True)
+
+def runPoint(job):
+	tool, point = job
+	return point, tools[tool](point)
+
+def loadCache(cache):
+	"finished rows by point key from a sweep cache file"
+
+	done = {}
+
+	if cache and os.path.isfile(cache):
+		with open(cache, "r") as f:
+			for line in f:
+				"a line cut short by an interrupted write is simply run again"
+				try:
+					entry = json.loads(line)
+				except ValueError:
+					continue
+
+				done[entry["key"]] = entry["row"]
+
+	return done
+
+def runSweep(tool, points, cache=None, processes=None):
+	"""run tool over every point on a pool of processes (all cores by default).
+	returns one row per point, in the order of points, with the parameters and the results"""
+
+	done = loadCache(cache)
+	pending = [point for point in points if pointKey(tool, point) not in done]
+
+	print("{} of {} points already done".format(len(points) - len(pending), len(points)))
+
+	if pending:
+		with Pool(processes) as pool:
+			with open(cache or os.devnull, "a") as f:
+				for point, result in pool.imap_unordered(runPoint, [(tool, point) for point in pending]):
+					row = dict(point)
+					row.update(result)
+
+					key = pointKey(tool, point)
+					done[key] = row
+
+					f.write(json.dumps({"key" : key, "row" : row}) + "\n")
+					f.flush()
+
+	return [done[pointKey(tool, point)] for point in points]
+
+def writeTable(rows, filename):
+	"write rows as a csv table with a column for every parameter and result"
+
+	columns = []
+	for row in rows:
+		for column in row:
+			if column not in columns:
+				columns.append(column)
+
+	with open(filename, "w") as f:
+		writer = csv.DictWriter(f, fieldnames=columns)
+		writer.writeheader()
+		writer.writerows(rows)
+
+def parseValue(value):
+	for kind in (int, float):
+		try:
+			return kind(value)
+		except ValueError:
+			pass
+
+	return value
+
+if __name__ == "__main__":
+
+	import argparse
+
+	parser = argparse.ArgumentParser()
+	parser.add_argument("tool", help="one of: {}".format(", ".join(sorted(tools))), type=str)
+	parser.add_argument("--set", help="parameter=value[,value...]; may be repeated", action="append", default=[])
+	parser.add_argument("--cache", help="file finished points are kept in so an interrupted sweep can resume", default=None, type=str)
+	parser.add_argument("--output", help="csv file for the results table", default=None, type=str)
+	parser.add_argument("--processes", help="number of worker processes; defaults to all cores", default=None, type=int)
+	args = parser.parse_args()
+
+	if args.tool not in tools:
+		raise Exception("error: unknown tool \"{}\"".format(args.tool))
+
+	parameters = {}
+
+	for setting in args.set:
+		name, values = setting.split("=", 1)
+		values = [parseValue(v) for v in values.split(",")]
+		parameters[name] = values if len(values) > 1 else values[0]
+
+	cache = args.cache or "sweep_{}.jsonl".format(args.tool)
+
+	rows = runSweep(args.tool, grid(**parameters), cache, args.processes)
+
+	if args.output:
+		writeTable(rows, args.output)
+	else:
+		for row in rows:
+			print(row)
@@ -0,0 +1,359 @@
+"""
+	vectorized thermal network
+
+	Keeps the state of a set of coupled ThermalObjects in contiguous NumPy
+	arrays and advances the whole network with array operations.  Every
+	array has a trailing "runs" axis so several variants of the same network
+	(for example different soil bank masses) are stepped together.
+
+	Bodies that freeze (thermalobject.PhaseChange) also keep their enthalpy
+	per unit thermal mass (C): steps add to it and their temperature is
+	worked out from it for all of them at once.
+"""
+import math
+import numpy as np
+
+from thermalobject import ThermalConstants, enthalpy, enthalpyTemperature, liquidFraction
+
+STEFAN_BOLTZMANN = 5.67 * math.pow(10, -8)
+
+class ThermalNetwork(object):
+
+	def __init__(self, runs=1):
+		object.__init__(self)
+
+		self.runs = runs
+		self.index = {}
+
+		self._bodies = []
+		self._links = []
+		self._radiators = []
+		self._absorbers = []
+		self._freezing = []
+
+		self.compiled = False
+
+	def addBody(self, name, thermalObject, mass=None, fixed=False, freezing=None):
+		"""add a body to the network.  mass may be an array with one entry per run.
+		fixed bodies are boundary conditions: their temperature only changes through setTemperature().
+		freezing is the fraction of the mass that is water that freezes, by default the object's (see thermalobject.PhaseChange),
+		and may be an array with one entry per run"""
+
+		if mass is None:
+			mass = thermalObject.mass
+
+		if freezing is None:
+			freezing = thermalObject.freezing if thermalObject.specificLatentHeat else 0
+
+		self.index[name] = len(self._bodies)
+		self._bodies.append((thermalObject, mass, fixed))
+		self._freezing.append(freezing)
+		self.compiled = False
+
+		return self.index[name]
+
+	def couple(self, a, b, contactArea=None, length=1, convection=False):
+		"""equivalent of a.transferTo(b, contactArea, length=length, convection=convection)
+		contactArea may be an array with one entry per run"""
+
+		if contactArea is None:
+			contactArea = self._bodies[self.index[a]][0].estimateContactArea(self._bodies[self.index[b]][0])
+
+		self._links.append((self.index[a], self.index[b], contactArea, length, convection))
+		self.compiled = False
+
+	def radiate(self, name, contactArea=None, returned=0):
+		"""equivalent of name.radiate(contactArea) where a fraction 'returned' of the radiated energy is
+		added back to the body (greenhouse effect)"""
+
+		if contactArea is None:
+			contactArea = self._bodies[self.index[name]][0].estimateContactArea()
+
+		self._radiators.append((self.index[name], contactArea, returned))
+		self.compiled = False
+
+	def absorb(self, name, area, efficiency=1):
+		"solar power (W/m^2) falling on name is absorbed over area with efficiency"
+
+		self._absorbers.append((self.index[name], area, efficiency))
+		self.compiled = False
+
+	def compile(self):
+		"freeze topology and constants into arrays"
+
+		n = len(self._bodies)
+		e = len(self._links)
+		r = self.runs
+
+		def column(value):
+			return np.broadcast_to(np.asarray(value, dtype=float), (r,))
+
+		self.specificHeat = np.array([o.specificHeat for o, m, f in self._bodies], dtype=float)
+		self.conductivity = np.array([o.conductivity for o, m, f in self._bodies], dtype=float)
+		self.emissivity = np.array([o.emissivity or 0 for o, m, f in self._bodies], dtype=float)
+
+		self.mass = np.empty((n, r))
+		self.temperature = np.empty((n, r))
+		self.fixed = np.zeros((n, 1), dtype=bool)
+
+		for i, (o, m, f) in enumerate(self._bodies):
+			self.mass[i] = column(m)
+			self.temperature[i] = o.temperature
+			self.fixed[i] = f
+
+		"thermal mass (m*c); fixed bodies get an infinite thermal mass so they never change"
+		self.thermalMass = self.mass * self.specificHeat[:, np.newaxis]
+		self._inverseThermalMass = np.where(self.fixed, 0.0, 1.0 / self.thermalMass)
+
+		self._src = np.array([l[0] for l in self._links], dtype=int)
+		self._dst = np.array([l[1] for l in self._links], dtype=int)
+
+		"conductance (W/C) when the source is the cooler body and when it is the hotter body"
+		area = np.empty((e, r))
+		for j, l in enumerate(self._links):
+			area[j] = column(l[2])
+
+		length = np.array([l[3] for l in self._links], dtype=float)[:, np.newaxis]
+		self._convection = np.array([l[4] for l in self._links], dtype=bool)[:, np.newaxis]
+		self._hasConvection = bool(self._convection.any())
+
+		conductanceCold = np.where(self._convection, 1.77 * area, self.conductivity[self._src][:, np.newaxis] * area / length)
+		conductanceHot = np.where(self._convection, 1.77 * area, self.conductivity[self._dst][:, np.newaxis] * area / length)
+
+		"""transferTo picks the direction of flow by comparing conductivities, so a hotter source with the same conductivity as
+		its destination gains energy instead of losing it.  fold that into the sign of the hot side conductance"""
+		equalConductivity = (self.conductivity[self._src] == self.conductivity[self._dst])[:, np.newaxis]
+		self._conductanceCold = conductanceCold
+		self._conductanceHot = np.where(equalConductivity, -conductanceHot, conductanceHot)
+
+		"difference matrix: temperature of the source minus temperature of the destination of every link"
+		self._difference = np.zeros((e, n))
+		self._difference[np.arange(e), self._src] = 1
+		self._difference[np.arange(e), self._dst] = -1
+
+		"incidence matrix: energy leaving the source of link j is added to its destination"
+		self._incidence = -self._difference.T.copy()
+
+		"radiation coefficient per body, zero for bodies that do not radiate"
+		self._radiation = np.zeros((n, r))
+		for i, contactArea, returned in self._radiators:
+			self._radiation[i] += (1 - returned) * self.emissivity[i] * STEFAN_BOLTZMANN * column(contactArea)
+
+		self._solarGain = np.zeros((n, 1))
+		for i, area, efficiency in self._absorbers:
+			self._solarGain[i] += area * efficiency
+
+		"scratch buffers reused on every step"
+		self._dT = np.empty((e, r))
+		self._cold = np.empty((e, r), dtype=bool)
+		self._conductance = np.empty((e, r))
+		self._radiated = np.empty((n, r))
+		self._solar = np.empty((n, 1))
+		self._power = np.empty((n, r))
+
+		"""bodies that freeze: their rows, the latent heat as a span of temperature (latent heat / specific heat), their freezing
+		points and enthalpies divided by thermal mass, which is what the integrators step in place of their temperature"""
+		phase = [i for i, (o, m, f) in enumerate(self._bodies) if np.any(self._freezing[i]) and not f]
+		p = len(phase)
+
+		self._phase = np.array(phase, dtype=int)
+		self._phaseIndex = dict((i, k) for k, i in enumerate(phase))
+		self._freezes = bool(phase)
+		self._latentSpan = np.empty((p, r))
+		self._freezingPoint = np.empty((p, 1))
+		self.enthalpy = np.empty((p, r))
+
+		for k, i in enumerate(phase):
+			o = self._bodies[i][0]
+			latentHeat = getattr(o, "latentHeat", ThermalConstants.LatentHeat.water)
+			self._latentSpan[k] = column(self._freezing[i]) * latentHeat / o.specificHeat
+			self._freezingPoint[k] = getattr(o, "freezingPoint", ThermalConstants.FreezingPoint.water)
+			self.enthalpy[k] = enthalpy(1, self._latentSpan[k], self.temperature[i], getattr(o, "liquid", 1), self._freezingPoint[k])
+
+		self.compiled = True
+
+	def phaseTemperature(self, enthalpy):
+		"temperatures of the bodies that freeze holding enthalpy (per unit thermal mass)"
+		return enthalpyTemperature(1, self._latentSpan, enthalpy, self._freezingPoint)
+
+	def setTemperature(self, name, value, liquid=1):
+		"""set a body's temperature; for a body that freezes, the fraction liquid of its freezing part is liquid
+		when value is the freezing point"""
+		i = self.index[name]
+		self.temperature[i] = value
+
+		if i in self._phaseIndex:
+			k = self._phaseIndex[i]
+			self.enthalpy[k] = enthalpy(1, self._latentSpan[k], self.temperature[i], liquid, self._freezingPoint[k])
+
+	def liquidFraction(self, name):
+		"fraction of the freezing part of a body that freezes that is liquid, per run"
+		k = self._phaseIndex[self.index[name]]
+		return liquidFraction(self._latentSpan[k], self.enthalpy[k])
+
+	def getTemperature(self, name):
+		return self.temperature[self.index[name]]
+
+	def rates(self, temperature, solarPower=0, out=None):
+		"net power (W) flowing into every body for the given temperatures"
+
+		if out is None:
+			out = np.empty(temperature.shape)
+
+		dT = np.dot(self._difference, temperature, out=self._dT)
+		cold = np.less(dT, 0, out=self._cold)
+
+		conductance = self._conductance
+		np.copyto(conductance, self._conductanceHot)
+		np.copyto(conductance, self._conductanceCold, where=cold)
+
+		if self._hasConvection:
+			"transferTo moves |dT|^(5/4) out of the source for convection unless the source is hotter with equal conductivity"
+			dT = np.where(self._convection, np.power(np.abs(dT), 5.0 / 4.0), dT)
+
+		"energy leaving the source of every link"
+		conductance *= dT
+		np.dot(self._incidence, conductance, out=out)
+
+		radiated = np.multiply(temperature, temperature, out=self._radiated)
+		radiated *= radiated
+		radiated *= self._radiation
+		out -= radiated
+
+		if solarPower:
+			out += np.multiply(self._solarGain, solarPower, out=self._solar)
+
+		return out
+
+	def step(self, solarPower=0, dt=1):
+		"advance the network dt seconds with an explicit euler step"
+
+		if not self.compiled:
+			self.compile()
+
+		power = self.rates(self.temperature, solarPower, out=self._power)
+		power *= self._inverseThermalMass
+		if dt != 1:
+			power *= dt
+		self.temperature += power
+
+		if self._freezes:
+			self.enthalpy += power[self._phase]
+			self.temperature[self._phase] = self.phaseTemperature(self.enthalpy)
+
+		return self.temperature
+
+	def system(self, forcing=None):
+		"""dT/dt as a function f(t, temperature) for the integrators module.  forcing(t) returns the solar
+		power and the temperature of the fixed bodies (or None) at time t.  the rows of bodies that freeze
+		hold their enthalpy per unit thermal mass instead of their temperature (see state())"""
+
+		if not self.compiled:
+			self.compile()
+
+		fixed = self.fixed[:, 0]
+		phase = self._phase
+
+		def f(t, temperature):
+			solarPower = 0
+
+			if self._freezes:
+				temperature = temperature.copy()
+				temperature[phase] = self.phaseTemperature(temperature[phase])
+
+			if forcing:
+				solarPower, boundary = forcing(t)
+				if boundary is not None:
+					if not self._freezes:
+						temperature = temperature.copy()
+					temperature[fixed] = boundary
+
+			power = self.rates(temperature, solarPower)
+			power *= self._inverseThermalMass
+
+			return power
+
+		return f
+
+	def state(self):
+		"the temperatures, with the enthalpy per unit thermal mass in the rows of bodies that freeze: what system() integrates"
+
+		if not self._freezes:
+			return self.temperature
+
+		state = self.temperature.copy()
+		state[self._phase] = self.enthalpy
+
+		return state
+
+	def setState(self, state):
+		"set the network from a state as state() returns it"
+
+		self.temperature[...] = state
+
+		if self._freezes:
+			self.enthalpy[...] = state[self._phase]
+			self.temperature[self._phase] = self.phaseTemperature(self.enthalpy)
+
+	def stableStep(self):
+		"""largest explicit euler step (s) that keeps every body stable at the current temperatures,
+		from the total conductance and radiation slope on each body relative to its thermal mass"""
+
+		if not self.compiled:
+			self.compile()
+
+		conductance = np.maximum(np.abs(self._conductanceCold), np.abs(self._conductanceHot))
+		total = np.dot(np.abs(self._incidence), conductance)
+		total += 4 * self._radiation * np.abs(self.temperature) ** 3
+
+		return 1.0 / np.max(total * self._inverseThermalMass)
+
+	def advance(self, seconds, forcing, integrator, start=0):
+		"""advance the network from start to start + seconds with an integrator from the integrators module.
+		returns the number of steps taken"""
+		from integrators import integrate
+
+		if integrator.fixedStep and integrator.initialStep > self.stableStep():
+			raise Exception("error: step of {}s is larger than the stable step of {}s for this network".format(integrator.initialStep, self.stableStep()))
+
+		state, steps = integrate(self.system(forcing), start, start + seconds, self.state(), integrator)
+
+		self.setState(state)
+		solarPower, boundary = forcing(start + seconds)
+		if boundary is not None:
+			self.temperature[self.fixed[:, 0]] = boundary
+
+		return steps
+
+	def selectRuns(self, runs):
+		"""keep only the runs with the given indices, in that order, so runs whose outcome is settled stop costing a step.
+		compiling again brings back every run from the bodies' masses"""
+
+		if not self.compiled:
+			self.compile()
+
+		runs = np.asarray(runs, dtype=int)
+
+		for name in ("temperature", "mass", "thermalMass", "_inverseThermalMass", "_conductanceCold", "_conductanceHot", "_radiation", "enthalpy", "_latentSpan"):
+			setattr(self, name, np.ascontiguousarray(getattr(self, name)[:, runs]))
+
+		self.runs = len(runs)
+		e = len(self._links)
+		n = len(self._bodies)
+
+		self._dT = np.empty((e, self.runs))
+		self._cold = np.empty((e, self.runs), dtype=bool)
+		self._conductance = np.empty((e, self.runs))
+		self._radiated = np.empty((n, self.runs))
+		self._power = np.empty((n, self.runs))
+
+	def writeBack(self, run=0):
+		"""copy temperatures of one run back onto the ThermalObjects the network was built from.  objects that freeze
+		(thermalobject.PhaseChange) also get the run's liquid fraction; their own fraction of mass that freezes is kept"""
+
+		for i, (o, m, f) in enumerate(self._bodies):
+			if i in self._phaseIndex and hasattr(o, "setTemperature"):
+				k = self._phaseIndex[i]
+				o.setTemperature(float(self.temperature[i, run]), float(liquidFraction(self._latentSpan[k, run], self.enthalpy[k, run])))
+			else:
+				o.temperature = float(self.temperature[i, run])
@@ -1,8 +1,15 @@
 """
 	thermal object
+
+	The free functions take Python numbers or NumPy arrays; arrays broadcast
+	against each other and against numbers, so whole batches of bodies or
+	exchanges are evaluated in one call.
 """
 import math
 
+import materials
+from materials import ThermalConstants, cubeDimensions
+
 def c_to_kelvin(c):
 	return c + 273.15
 
@@ -19,6 +26,12 @@ def energyTransferred(k, tempFinal, tempStart, area, time, distance):
 def convectionEnergyTransfer(area, tempFinal, tempStart):
 
 	deltaT = (tempFinal - tempStart)
+
+	if not isinstance(deltaT, (float, int)):
+		"arrays: the sign of deltaT instead of a branch per element"
+		import numpy as np
+		return 1.77 * area * np.power(np.abs(deltaT), 5.0/4.0) * np.sign(deltaT)
+
 	q = 1.77 * area * math.pow(abs(deltaT), 5.0/4.0)
 
 	if deltaT < 0:
@@ -38,47 +51,42 @@ def temperature(c, mass, energy):
 def radiantEnergy(emissivity, surfaceArea, temperature):
 	" Q = emissivity * 5.67x10-8 * surfaceArea * (temperature^4 - temperature2^4)"
 
-	return emissivity * (5.67 * math.pow(10, -8)) * surfaceArea * (math.pow(temperature, 4))
-
-
-class ThermalConstants:
-	class Emissivity:
-		soil = 0.38
-		water = 0.67
-		blackBody = 1
-		aluminum = 0.09
+	return emissivity * (5.67 * math.pow(10, -8)) * surfaceArea * (temperature ** 4)
 
-	class Density:
-		"g/m^3"
-		air = 1225
-		soil = 1600000
-		water =  1000000
-		aluminum = 2712000
+def enthalpy(thermalMass, latentCapacity, temperature, liquid=1, freezingPoint=0):
+	"""J in a body relative to it all liquid at freezingPoint.  latentCapacity (J) is given up as it freezes;
+	at freezingPoint the fraction liquid of the freezing part is still liquid"""
+	frozen = (temperature < freezingPoint) + (1 - liquid) * (temperature == freezingPoint)
+	return thermalMass * (temperature - freezingPoint) - latentCapacity * frozen
 
+def enthalpyTemperature(thermalMass, latentCapacity, enthalpy, freezingPoint=0):
+	"""C of a body holding enthalpy J: held at freezingPoint while the latent heat goes, sensible either side of it.
+	max(h, 0) and min(h + latentCapacity, 0) are taken as (x + |x|) / 2 and (x - |x|) / 2, so there is no branch per body"""
+	melted = enthalpy + latentCapacity
+	return freezingPoint + ((enthalpy + abs(enthalpy)) + (melted - abs(melted))) / (2 * thermalMass)
 
-	class SpecificHeat:
-		"measured in J/g"
-		water = 4.184
-		soil = 1.480
-		air = 1.003
-		aluminum = 0.9
+def liquidFraction(latentCapacity, enthalpy):
+	"fraction of the freezing part of a body that is liquid, 0 to 1"
+	fraction = 1 + enthalpy / latentCapacity
+	fraction = (fraction + abs(fraction)) / 2
+	return (fraction + 1 - abs(fraction - 1)) / 2
 
-	class Conductivity:
-		"in joules/(sec*m*C) or k-value"
-		soil = 1.0
-		water = 0.58
-		pex = 0.4
-		air = 0.024
-		aluminum = 205
-		glass = 0.8
 
+class ThermalObject(object):
+	"""a body with a uniform temperature.  attributes live in slots and the thermal mass (mass * specificHeat)
+	is cached whenever either changes, so energy bookkeeping is a multiply or divide"""
 
+	__slots__ = ("_specificHeat", "density", "conductivity", "emissivity", "dimensions", "_mass", "_thermalMass", "temperature")
 
-class ThermalObject(object):
+	"J/g of the body given up on freezing; only PhaseChange bodies freeze"
+	specificLatentHeat = 0
 
 	def __init__(self, specificHeat = None, density=None, conductivity=None, emissivity=None, dimensions=None, temperature = 15, mass=None):
 		object.__init__(self)
 
+		self._mass = None
+		self._thermalMass = None
+
 		self.specificHeat = specificHeat
 		self.density = density
 		self.conductivity = conductivity
@@ -88,13 +96,39 @@ class ThermalObject(object):
 		if mass:
 			self.mass = mass
 			if not dimensions:
-				self.dimensions = (math.pow(mass / density, 1 / 3.0), math.pow(mass / density, 1 / 3.0), math.pow(mass / density, 1 / 3.0))
+				self.dimensions = cubeDimensions(density, mass)
 
 		elif dimensions != None:
 			self.mass = dimensions[0] * dimensions[1] * dimensions[2] * self.density
 
 		self.temperature = temperature
 
+	@property
+	def specificHeat(self):
+		return self._specificHeat
+
+	@specificHeat.setter
+	def specificHeat(self, value):
+		self._specificHeat = value
+		self._thermalMass = value * self._mass if value is not None and self._mass is not None else None
+
+	@property
+	def mass(self):
+		if self._mass is None:
+			raise AttributeError("mass")
+
+		return self._mass
+
+	@mass.setter
+	def mass(self, value):
+		self._mass = value
+		self._thermalMass = self._specificHeat * value if self._specificHeat is not None and value is not None else None
+
+	@property
+	def thermalMass(self):
+		"J/C; mass * specificHeat"
+		return self._thermalMass
+
 	@property
 	def massR(self):
 		"m = c^2/e"
@@ -102,14 +136,14 @@ class ThermalObject(object):
 
 	@property
 	def energy(self):
-		return energyCapacity(self.specificHeat, self.mass, self.temperature)
+		return self._thermalMass * self.temperature
 
 	@energy.setter
 	def energy(self, value):
-		self.temperature = temperature(self.specificHeat, self.mass, value)
+		self.temperature = value / self._thermalMass
 
 	def addEnergy(self, value):
-		self.energy += value
+		self.temperature = (self._thermalMass * self.temperature + value) / self._thermalMass
 
 	def estimateContactArea(self, otherObject=None):
 
@@ -167,7 +201,83 @@ class ThermalObject(object):
 		return totalEt
 
 	def removeEnergy(self, energy):
-		self.energy -= energy
+		self.temperature = (self._thermalMass * self.temperature - energy) / self._thermalMass
+
+	def exchangeRate(self, otherObject, contactArea=None, convection=False, length=1):
+		"""rate constant of the temperature difference between self and otherObject under transferTo.
+		returns (rate, converging): d(dT)/dt = -rate * dT (conduction) or -rate * dT^(5/4) (convection)
+		while converging, with the sign flipped when transferTo pushes the two temperatures apart"""
+
+		if not contactArea:
+			contactArea = self.estimateContactArea(otherObject)
+
+		hotter = self.temperature >= otherObject.temperature
+		equalConductivity = self.conductivity == otherObject.conductivity
+
+		if convection:
+			"transferTo only moves convected energy from the hotter to the cooler body when their conductivities differ"
+			coefficient = 1.77 * contactArea
+			converging = hotter and not equalConductivity
+		else:
+			"the cooler body's conductivity is used and equal conductivities push energy into self"
+			coefficient = (otherObject.conductivity if hotter else self.conductivity) * contactArea / length
+			converging = not (hotter and equalConductivity)
+
+		rate = coefficient * (1.0 / (self.mass * self.specificHeat) + 1.0 / (otherObject.mass * otherObject.specificHeat))
+
+		return rate, converging
+
+	def equilibriumTemperature(self, otherObject):
+		return tempFinal(self.mass, self.specificHeat, self.temperature, otherObject.mass, otherObject.specificHeat, otherObject.temperature)
+
+	def temperatureAt(self, otherObject, time, contactArea=None, convection=False, length=1):
+		"""temperatures of self and otherObject after time seconds of exchanging energy with transferTo, in closed form.
+		returns (selfTemperature, otherTemperature) without changing either object"""
+
+		rate, converging = self.exchangeRate(otherObject, contactArea, convection, length)
+		gap = abs(self.temperature - otherObject.temperature)
+
+		if not convection:
+			gap *= math.exp(-rate * time if converging else rate * time)
+		elif gap:
+			"separable: gap^(-1/4) moves linearly in time"
+			inverseRoot = math.pow(gap, -0.25) + (rate * time / 4 if converging else -rate * time / 4)
+			gap = math.pow(inverseRoot, -4) if inverseRoot > 0 else float("inf")
+
+		if self.temperature < otherObject.temperature:
+			gap = -gap
+
+		selfCapacity = self.mass * self.specificHeat
+		otherCapacity = otherObject.mass * otherObject.specificHeat
+		final = self.equilibriumTemperature(otherObject)
+
+		return final + gap * otherCapacity / (selfCapacity + otherCapacity), final - gap * selfCapacity / (selfCapacity + otherCapacity)
+
+	def timeToGap(self, otherObject, gap, contactArea=None, convection=False, length=1):
+		"""seconds of transferTo until the temperature difference between self and otherObject reaches gap, in closed form.
+		returns 0 if it is already there and None if it never gets there, as for two bodies at the same temperature
+		that transferTo would drive apart
+
+		>>> Soil(mass=100, temperature=10).timeToGap(Soil(mass=50, temperature=10), 1) is None
+		True
+		>>> Soil(mass=100, temperature=10).timeToGap(Soil(mass=50, temperature=10), 1, convection=True) is None
+		True
+		"""
+
+		rate, converging = self.exchangeRate(otherObject, contactArea, convection, length)
+		start = abs(self.temperature - otherObject.temperature)
+
+		if (start <= gap) == converging:
+			return 0 if start == gap or converging else None
+
+		if gap <= 0 or not rate or start == 0:
+			"a gap that has not opened never opens: transferTo moves nothing between equal temperatures"
+			return None
+
+		if not convection:
+			return abs(math.log(start / gap)) / rate
+
+		return 4 * abs(math.pow(gap, -0.25) - math.pow(start, -0.25)) / rate
 
 	def radiate(self, contactArea = None, seconds = 1):
 		if not contactArea:
@@ -185,19 +295,116 @@ class ThermalObject(object):
 
 class Water(ThermalObject):
 
+	__slots__ = ()
+
 	def __init__(self, dimensions=None, temperature=15, mass=None):
-		ThermalObject.__init__(self, ThermalConstants.SpecificHeat.water, ThermalConstants.Density.water, ThermalConstants.Conductivity.water, ThermalConstants.Emissivity.water, dimensions, temperature, mass=mass)
+		ThermalObject.__init__(self, *materials.water.constants, dimensions=dimensions, temperature=temperature, mass=mass)
 
 
 class Soil(ThermalObject):
 
+	__slots__ = ()
+
 	def __init__(self, dimensions=None, temperature=15, mass=None):
-		ThermalObject.__init__(self, ThermalConstants.SpecificHeat.soil, ThermalConstants.Density.soil, ThermalConstants.Conductivity.soil, ThermalConstants.Emissivity.soil, dimensions, temperature, mass=mass)
+		ThermalObject.__init__(self, *materials.soil.constants, dimensions=dimensions, temperature=temperature, mass=mass)
+
+class PhaseChange(ThermalObject):
+	"""a body part of whose mass (the fraction 'freezing') is water that freezes at freezingPoint.  its state is its
+	enthalpy: every exchange sets the temperature to T + e / thermalMass, so e is added to the enthalpy and the
+	temperature follows from it, holding at freezingPoint until the latent heat is gone.  assigning a temperature
+	is therefore an exchange too; setTemperature() sets the state outright.  the frozen body keeps the specific
+	heat of the liquid.  set the state again after changing the mass or specific heat"""
+
+	__slots__ = ("freezing", "latentHeat", "freezingPoint", "specificLatentHeat", "_enthalpy", "_temperature")
+
+	def __init__(self, specificHeat=None, density=None, conductivity=None, emissivity=None, dimensions=None, temperature=15, mass=None, freezing=1, latentHeat=ThermalConstants.LatentHeat.water, freezingPoint=ThermalConstants.FreezingPoint.water, liquid=1):
+
+		if not mass and dimensions is None:
+			raise Exception("error: a body that freezes needs a mass or dimensions")
+
+		self.freezing = freezing
+		self.latentHeat = latentHeat
+		self.specificLatentHeat = freezing * latentHeat
+		self.freezingPoint = freezingPoint
+
+		"all liquid at the freezing point until ThermalObject sets the temperature"
+		self._enthalpy = 0
+		self._temperature = freezingPoint
+
+		ThermalObject.__init__(self, specificHeat, density, conductivity, emissivity, dimensions, temperature, mass)
+		self.setTemperature(temperature, liquid)
+
+	@property
+	def latentCapacity(self):
+		"J given up freezing all of the freezing part"
+		return self._mass * self.specificLatentHeat
+
+	@property
+	def temperature(self):
+		return self._temperature
+
+	@temperature.setter
+	def temperature(self, value):
+		self._enthalpy += self._thermalMass * (value - self._temperature)
+		self._temperature = enthalpyTemperature(self._thermalMass, self._mass * self.specificLatentHeat, self._enthalpy, self.freezingPoint)
+
+	@property
+	def enthalpy(self):
+		"J relative to the body all liquid at the freezing point"
+		return self._enthalpy
+
+	@enthalpy.setter
+	def enthalpy(self, value):
+		self._enthalpy = value
+		self._temperature = enthalpyTemperature(self._thermalMass, self._mass * self.specificLatentHeat, value, self.freezingPoint)
+
+	@property
+	def liquid(self):
+		return liquidFraction(self.latentCapacity, self._enthalpy)
+
+	@property
+	def energy(self):
+		"as ThermalObject.energy for the liquid; the latent heat given up freezing counts against it"
+		return self._enthalpy + self._thermalMass * self.freezingPoint
+
+	@energy.setter
+	def energy(self, value):
+		self.enthalpy = value - self._thermalMass * self.freezingPoint
+
+	def addEnergy(self, value):
+		self.enthalpy = self._enthalpy + value
+
+	def removeEnergy(self, energy):
+		self.enthalpy = self._enthalpy - energy
+
+	def setTemperature(self, temperature, liquid=1):
+		"set the state to temperature, with the fraction liquid of the freezing part liquid when that is the freezing point"
+		self._enthalpy = enthalpy(self._thermalMass, self.latentCapacity, temperature, liquid, self.freezingPoint)
+		self._temperature = temperature
+
+
+class FreezingWater(PhaseChange):
+
+	__slots__ = ()
+
+	def __init__(self, dimensions=None, temperature=15, mass=None, liquid=1):
+		PhaseChange.__init__(self, *materials.water.constants, dimensions=dimensions, temperature=temperature, mass=mass, liquid=liquid)
+
+
+class MoistSoil(PhaseChange):
+	"soil holding moisture g of water per g"
+
+	__slots__ = ()
+
+	def __init__(self, dimensions=None, temperature=15, mass=None, moisture=0.2, liquid=1):
+		PhaseChange.__init__(self, *materials.soil.constants, dimensions=dimensions, temperature=temperature, mass=mass, freezing=moisture, liquid=liquid)
 
 class Air(ThermalObject):
 
+	__slots__ = ("humidity",)
+
 	def __init__(self, dimensions=None, temperature=15, mass=None, humidity=0):
-		ThermalObject.__init__(self, ThermalConstants.SpecificHeat.air, ThermalConstants.Density.air, ThermalConstants.Conductivity.air, ThermalConstants.Emissivity.blackBody, dimensions, temperature, mass=mass)
+		ThermalObject.__init__(self, *materials.air.constants, dimensions=dimensions, temperature=temperature, mass=mass)
 		self.humidity = humidity
 
 	@property
@@ -214,12 +421,23 @@ class Air(ThermalObject):
 
 class Aluminum(ThermalObject):
 
+	__slots__ = ()
+
 	def __init__(self, dimensions=None, temperature=15, mass=None):
-		ThermalObject.__init__(self, ThermalConstants.SpecificHeat.aluminum, ThermalConstants.Density.aluminum, ThermalConstants.Conductivity.aluminum, ThermalConstants.Emissivity.aluminum, dimensions, temperature, mass=mass)
+		ThermalObject.__init__(self, *materials.aluminum.constants, dimensions=dimensions, temperature=temperature, mass=mass)
 
 
 class Glass(ThermalObject):
 
+	__slots__ = ()
+
 	def __init__(self, dimensions=None, temperature=15, mass=None):
-		ThermalObject.__init__(self, 753, 2600000, 0.8, 0, dimensions=dimensions, temperature=temperature, mass=mass)
+		ThermalObject.__init__(self, *materials.glass.constants, dimensions=dimensions, temperature=temperature, mass=mass)
+
+def fromMaterial(material, dimensions=None, temperature=15, mass=None):
+	"a ThermalObject of a registered material (see the materials module), by name or record"
+
+	if isinstance(material, str):
+		material = materials.material(material)
 
+	return ThermalObject(*material.constants, dimensions=dimensions, temperature=temperature, mass=mass)
@@ -1,54 +1,116 @@
-from thermalobject import Water, Soil, Air, c_to_kelvin, kelvin_to_c
+from thermalobject import Water, Soil, Air, ThermalConstants, c_to_kelvin, kelvin_to_c
 import json
+import math
 
-def cooling_loop(transfer_medium, energy_to_sink, max_tube_length, tube_diameter, soil_temp, flow_rate, verbose = False):
+class TubeExchanger(object):
+	"""fluid pumped through a tube buried in soil, marched along the tube in segments.
+	within a segment the fluid relaxes exponentially towards the soil temperature (effectiveness-NTU):
+	T_out = T_soil + (T_in - T_soil) * exp(-conductance * segmentLength / (massFlow * specificHeat))
 
-	soil = Soil(mass=9999999999, temperature=soil_temp-1)
+	conductance is W/C per meter of tube; by default the soil's conductivity over the tube's
+	circumference with transferTo's default length of 1m, as cooling_loop used to assume"""
 
-	seconds = 999
-	length = 0
-	time = flow_rate
-	energy = 0
-	startTemp = transfer_medium.temperature
+	def __init__(self, tube_diameter, flow_rate, transfer_medium, conductance=None, segments=100):
+		object.__init__(self)
+
+		self.tube_diameter = tube_diameter
+		self.segments = segments
+
+		"flow_rate is l/s; g/s * J/(g*C) = W/C"
+		self.capacityRate = (flow_rate / 1000) * transfer_medium.density * transfer_medium.specificHeat
+		self.flow_rate = flow_rate
+
+		if conductance is None:
+			conductance = ThermalConstants.Conductivity.soil * math.pi * tube_diameter
+
+		self.conductance = conductance
+
+	def volume(self, length):
+		return math.pi * (self.tube_diameter / 2) ** 2 * length
+
+	def temperatures(self, inlet, soil_temp, length):
+		"""fluid temperature at the inlet and the end of every segment.  soil_temp may be one temperature per segment.
+		the march is vectorized: T_n = r^n T_0 + (1 - r) sum_j r^(n-1-j) soil_j, evaluated in chunks so r^-n can't overflow"""
+		import numpy as np
+
+		soil = np.broadcast_to(np.asarray(soil_temp, dtype=float), (self.segments,))
+		ntu = self.conductance * (length / self.segments) / self.capacityRate
+		r = math.exp(-ntu)
+
+		result = np.empty(self.segments + 1)
+		result[0] = inlet
 
-	while  abs(energy) < (energy_to_sink * time) and length < max_tube_length:
-		length += 1
+		if ntu > 300:
+			"the fluid leaves every segment at its soil temperature"
+			result[1:] = soil
+			return result
 
-		if verbose:
-			print("trying tubing length: {}".format(length))
-			print("{} temp: {}C".format(transfer_medium, kelvin_to_c(transfer_medium.temperature)))
-			print("{} mass: {}g".format(transfer_medium, transfer_medium.mass))
+		"keep r^-chunk within about e^300"
+		chunk = self.segments if ntu == 0 else max(1, min(self.segments, int(300 / ntu)))
 
-		d = tube_diameter
-		surface_area = 2 * 3.1415 * (d/2) * length + 2* 3.1415 * ((d/2) * (d/2))
+		for first in range(0, self.segments, chunk):
+			n = np.arange(1, min(chunk, self.segments - first) + 1)
+			weighted = np.cumsum(soil[first:first + len(n)] * np.power(r, -n))
+			result[first + n] = np.power(r, n) * (result[first] + (1 - r) * weighted)
 
-		tube_volume = 3.1415 * ((d/2) * (d/2)) * length # m^3
+		return result
 
-		transfer_medium.mass = tube_volume * transfer_medium.density
-		transfer_medium.temperature = startTemp
+	def heatRate(self, inlet, soil_temp, length):
+		"W the fluid gives up to the soil over length meters of tube"
+		return self.capacityRate * (inlet - self.temperatures(inlet, soil_temp, length)[-1])
 
-		time = tube_volume / (flow_rate / 1000)
+	def requiredLength(self, heat_rate, inlet, soil_temp, max_tube_length, tolerance=0.01):
+		"""tube length that sinks heat_rate W, found by bisection on heatRate.
+		returns None if even max_tube_length does not"""
 
-		if verbose:
-			print("time to move all medium: {}".format(time))
+		if abs(self.heatRate(inlet, soil_temp, max_tube_length)) < abs(heat_rate):
+			return None
 
-		#transfer_medium.energy += (energy_to_sink * time)
+		lower = 0
+		upper = max_tube_length
 
-		soil.temperature = soil_temp - 1
+		while upper - lower > tolerance:
+			middle = (lower + upper) / 2
 
-		energy = transfer_medium.transferTo(soil, contactArea=surface_area, time=time)
+			if abs(self.heatRate(inlet, soil_temp, middle)) < abs(heat_rate):
+				lower = middle
+			else:
+				upper = middle
 
-		if verbose:
-			print("energy transferred: {}/{}".format(abs(energy), energy_to_sink*time))
-			print("medium temp after transfer: {}C".format(kelvin_to_c(transfer_medium.temperature)))
+		return upper
+
+def cooling_loop(transfer_medium, energy_to_sink, max_tube_length, tube_diameter, soil_temp, flow_rate, verbose = False, segments = 100):
+
+	exchanger = TubeExchanger(tube_diameter, flow_rate, transfer_medium, segments=segments)
+	startTemp = transfer_medium.temperature
+
+	length = exchanger.requiredLength(energy_to_sink, startTemp, soil_temp, max_tube_length)
+
+	if length is None:
+		print("{}m of tubing can not sink {}W".format(max_tube_length, energy_to_sink))
+		length = max_tube_length
+
+	"time for the medium to travel the whole tube"
+	time = exchanger.volume(length) / (flow_rate / 1000)
+	energy = exchanger.heatRate(startTemp, soil_temp, length)
+
+	if verbose:
+		for i, t in enumerate(exchanger.temperatures(startTemp, soil_temp, length)):
+			print("{}m: {}C".format(round(length * i / segments, 2), round(kelvin_to_c(t), 3)))
 
 	print("----------------------")
 	print("energy to transfer: {}W".format(round(energy_to_sink, 2)))
-	print("energy transferred: {}W".format(round(abs(energy / time),2)))
+	print("energy transferred: {}W".format(round(abs(energy),2)))
 	print("total time for complete cycle of medium: {}".format(round(time)))
 	print("final length: {} meters".format(round(length,2)))
 	print("energy transferred per meter: {}W/m".format(round(energy_to_sink / length,2)))
 
+	return {
+		"length" : length,
+		"energy_transferred" : abs(energy),
+		"cycle_time" : time
+	}
+
 
 
 def main():
@@ -63,6 +125,7 @@ def main():
 	parser.add_argument('--transfer_medium', help="air or water", type=str, default="water")
 	parser.add_argument('--setpoint', help="desired temperature setpoint in C", default=32, type=int)
 	parser.add_argument('--geothermal_temp', help="temperature  of geothermal mass in C", default=15, type=int)
+	parser.add_argument('--segments', help="number of segments the tube is marched in", default=100, type=int)
 	parser.add_argument('--verbose', help='verbose mode', action='store_true')
 
 	args = parser.parse_args()
@@ -105,7 +168,7 @@ def main():
 	print("Transfer medium: {}".format(args.transfer_medium))
 	print("Setpoint: {}".format(args.setpoint))
 
-	cooling_loop(transfer_medium, energy_to_sink, args.max_tube_length, args.tube_diameter, endTemp, args.flow_rate, verbose=args.verbose)
+	cooling_loop(transfer_medium, energy_to_sink, args.max_tube_length, args.tube_diameter, endTemp, args.flow_rate, verbose=args.verbose, segments=args.segments)
 
 	#Use solar constant to figure out how much energy we need to sink:
 
@@ -0,0 +1,164 @@
+"""
+	ui channel
+
+	Publishes simulation state to a front-end without flooding it.  State is
+	offered every simulated step but only sent as one batched "frame" message
+	per interval (wall clock seconds, or simulated steps); frames in between
+	are never built.  A sink that can't keep up drops frames instead of
+	stalling the simulation.  One-off events (a new day, a failure) are never
+	dropped: they are queued and go out in order.
+
+	Sinks: pyotherside for the QML front-end, or a JSON-lines stand-in on a
+	stream (stdout) or a local socket.
+"""
+import json
+import socket
+import sys
+import time
+
+class OtherSideSink(object):
+	"messages to the QML front-end through pyotherside.send(name, value)"
+
+	def __init__(self):
+		object.__init__(self)
+		import pyotherside
+		self.pyotherside = pyotherside
+
+	def busy(self):
+		return False
+
+	def send(self, name, value):
+		self.pyotherside.send(name, value)
+
+class StreamSink(object):
+	"one JSON line per message, [name, value], on a stream"
+
+	def __init__(self, stream=None):
+		object.__init__(self)
+		self.stream = stream or sys.stdout
+
+	def busy(self):
+		return False
+
+	def send(self, name, value):
+		self.stream.write(json.dumps([name, value], default=str) + "\n")
+		self.stream.flush()
+
+class SocketSink(object):
+	"""JSON lines to a listener on a local TCP port.  the socket never blocks: while a message is
+	still going out the sink is busy, which makes the channel drop frames"""
+
+	def __init__(self, host="localhost", port=8765):
+		object.__init__(self)
+
+		self.socket = socket.create_connection((host, port))
+		self.socket.setblocking(False)
+		self.pending = b""
+
+	def drain(self):
+		if self.pending:
+			try:
+				sent = self.socket.send(self.pending)
+				self.pending = self.pending[sent:]
+			except BlockingIOError:
+				pass
+
+	def busy(self):
+		self.drain()
+		return bool(self.pending)
+
+	def send(self, name, value):
+		self.pending += (json.dumps([name, value], default=str) + "\n").encode('utf-8')
+		self.drain()
+
+class EventChannel(object):
+	"""batches state into at most one "frame" message per interval wall clock seconds, or one every
+	'every' simulated steps when that is given.  the clock is only read every 'check' steps"""
+
+	def __init__(self, sink, interval=0.1, every=None, check=256):
+		object.__init__(self)
+
+		self.sink = sink
+		self.interval = interval
+		self.every = every
+		self.check = every or check
+
+		self.counter = 1
+		self.next = 0
+		self.events = []
+
+		self.sent = 0
+		self.dropped = 0
+
+	def due(self):
+		"""count a simulated step; True when a frame should be built and passed to frame().
+		checking first means steps between frames cost a counter decrement"""
+
+		self.counter -= 1
+
+		if self.counter:
+			return False
+
+		self.counter = self.check
+
+		if self.every:
+			return True
+
+		now = time.monotonic()
+
+		if now < self.next:
+			return False
+
+		self.next = now + self.interval
+		return True
+
+	def frame(self, values):
+		"send values as one frame, after any queued events.  dropped if the sink is still busy"
+
+		if not self.flush():
+			self.dropped += 1
+			return
+
+		self.sink.send("frame", values)
+		self.sent += 1
+
+	def event(self, name, value):
+		"queue a one-off message; it is sent as soon as the sink has room"
+		self.events.append((name, value))
+		self.flush()
+
+	def flush(self):
+		"send queued events.  returns False if the sink is busy"
+
+		while self.events:
+			if self.sink.busy():
+				return False
+
+			self.sink.send(*self.events.pop(0))
+
+		return not self.sink.busy()
+
+def channel(kind="auto", interval=0.1, every=None):
+	"""EventChannel on a sink by name: pyotherside, stdout, socket:HOST:PORT, none (returns None),
+	or auto, which is pyotherside when it is available and none otherwise"""
+
+	if kind == "auto":
+		try:
+			import pyotherside
+			kind = "pyotherside"
+		except ImportError:
+			kind = "none"
+
+	if kind == "none":
+		return None
+	elif kind == "pyotherside":
+		sink = OtherSideSink()
+	elif kind == "stdout":
+		sink = StreamSink()
+	elif kind.startswith("socket:"):
+		host, port = kind[len("socket:"):].rsplit(":", 1)
+		sink = SocketSink(host, int(port))
+	else:
+		raise Exception("error: unknown ui channel \"{}\"".format(kind))
+
+	return EventChannel(sink, interval, every)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+"""
+	weather providers
+
+	Sources of daily weather history in the wunderground JSON shape that the
+	weather/ cache and weatherstore understand:
+
+	WundergroundProvider  the history API, or anything serving the same URLs
+	FileProvider          an existing directory of weather_YYYYMMDD.json files
+	ClimateProvider       plausible synthetic days generated from monthly normals
+
+	prefetch() writes a whole run's days into the cache up front, and serve()
+	runs a local HTTP stand-in for the history API so runs work offline.
+"""
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import json
+import math
+import os.path
+import random
+import tempfile
+from urllib.request import urlopen
+
+class WundergroundProvider(object):
+
+	def __init__(self, key="cbd714e056969068", location="OR/Hillsboro", baseUrl="http://api.wunderground.com/api"):
+		object.__init__(self)
+		self.key = key
+		self.location = location
+		self.baseUrl = baseUrl
+
+	def history(self, date):
+		f = urlopen("{0}/{1}/history_{2}/q/{3}.json".format(self.baseUrl, self.key, date.strftime("%Y%m%d"), self.location))
+		return json.loads(f.read().decode('utf-8'))
+
+class FileProvider(object):
+
+	def __init__(self, directory):
+		object.__init__(self)
+		self.directory = directory
+
+	def history(self, date):
+		with open(os.path.join(self.directory, "weather_{0}.json".format(date.strftime("%Y%m%d"))), "r") as f:
+			return json.loads(f.read())
+
+class ClimateProvider(object):
+	"""synthetic weather from monthly normals: a diurnal temperature cycle between the month's mean min (5am)
+	and max (3pm) shifted by a random day to day anomaly, and hourly conditions drawn from the month's cloud cover.
+	the same date always produces the same day"""
+
+	"""monthly normals for Hillsboro, OR: mean daily min and max (C) and the fraction of overcast hours"""
+	hillsboro = {
+		"min" : [1.1, 1.1, 2.8, 4.4, 7.2, 10.0, 11.7, 11.7, 8.9, 5.6, 3.3, 0.6],
+		"max" : [8.9, 11.1, 14.4, 17.2, 21.1, 24.4, 28.9, 29.4, 25.6, 18.3, 11.7, 8.3],
+		"cloud" : [0.75, 0.7, 0.65, 0.6, 0.5, 0.4, 0.2, 0.2, 0.3, 0.5, 0.7, 0.75]
+	}
+
+	def __init__(self, normals=None, anomaly=3.0, seed=0):
+		object.__init__(self)
+
+		if isinstance(normals, str):
+			with open(normals, "r") as f:
+				normals = json.loads(f.read())
+
+		self.normals = normals or self.hillsboro
+		self.anomaly = anomaly
+		self.seed = seed
+
+	def temperature(self, minTemp, maxTemp, hour):
+		"cosine from the min at 5am up to the max at 3pm and back down overnight"
+		if 5 <= hour <= 15:
+			phase = (hour - 5) / 10.0
+		else:
+			phase = 1 + ((hour - 15) % 24) / 14.0
+
+		return minTemp + (maxTemp - minTemp) * (1 - math.cos(math.pi * phase)) / 2
+
+	def history(self, date):
+		rng = random.Random(int(date.strftime("%Y%m%d")) * 1000 + self.seed)
+		month = date.month - 1
+
+		offset = rng.gauss(0, self.anomaly)
+		minTemp = self.normals["min"][month] + offset
+		maxTemp = self.normals["max"][month] + offset + rng.gauss(0, self.anomaly / 2)
+		cloud = self.normals["cloud"][month]
+
+		observations = []
+		condition = "Overcast" if rng.random() < cloud else "Clear"
+
+		for hour in range(24):
+			"conditions change slowly, usually sticking for several hours"
+			if rng.random() < 0.25:
+				roll = rng.random()
+				if roll < cloud * 0.6:
+					condition = "Overcast"
+				elif roll < cloud * 0.85:
+					condition = "Mostly Cloudy"
+				elif roll < cloud:
+					condition = rng.choice(["Scattered Clouds", "Fog"]) if hour < 10 else "Scattered Clouds"
+				else:
+					condition = "Clear"
+
+			d = {"year" : date.strftime("%Y"), "mon" : date.strftime("%m"), "mday" : date.strftime("%d"), "hour" : "{:02d}".format(hour), "min" : "53", "tzname" : "America/Los_Angeles"}
+			observations.append({
+				"date" : d,
+				"tempm" : "{:.1f}".format(self.temperature(minTemp, maxTemp, hour + 53 / 60.0)),
+				"conds" : condition
+			})
+
+		summary = {
+			"date" : {"year" : date.strftime("%Y"), "mon" : date.strftime("%m"), "mday" : date.strftime("%d")},
+			"mintempm" : "{:.0f}".format(minTemp),
+			"maxtempm" : "{:.0f}".format(maxTemp),
+			"meantempm" : "{:.0f}".format((minTemp + maxTemp) / 2)
+		}
+
+		return {"history" : {"dailysummary" : [summary], "observations" : observations}}
+
+def cacheFilename(date, directory="weather"):
+	return os.path.join(directory, "weather_{0}.json".format(date.strftime("%Y%m%d")))
+
+def prefetch(provider, start, days, directory="weather", threads=8):
+	"""write every day of a run that is missing from the cache, fetching them in parallel.
+	returns the number of days fetched"""
+
+	dates = [start + timedelta(days = day) for day in range(days)]
+	missing = [date for date in dates if not os.path.isfile(cacheFilename(date, directory))]
+
+	if not missing:
+		return 0
+
+	os.makedirs(directory, exist_ok=True)
+
+	def fetch(date):
+		w = provider.history(date)
+
+		"""write to a file of this thread's own and rename, so a half written day is never picked up and prefetches
+		of the same days at once do not write over each other"""
+		with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".partial", delete=False) as partial:
+			partial.write(json.dumps(w))
+
+		os.replace(partial.name, cacheFilename(date, directory))
+
+	with ThreadPoolExecutor(threads) as pool:
+		list(pool.map(fetch, missing))
+
+	return len(missing)
+
+def serve(provider, port=8080):
+	"""answer /api/<key>/history_YYYYMMDD/q/<location>.json from provider, the same shape as the wunderground history API.
+	point WundergroundProvider(baseUrl="http://localhost:<port>/api") at it"""
+	from http.server import BaseHTTPRequestHandler, HTTPServer
+	import re
+
+	pattern = re.compile(r"/api/[^/]+/history_(\d{8})/q/.+\.json$")
+
+	class Handler(BaseHTTPRequestHandler):
+		def do_GET(self):
+			match = pattern.match(self.path)
+
+			if not match:
+				self.send_error(404)
+				return
+
+			body = json.dumps(provider.history(datetime.strptime(match.group(1), "%Y%m%d"))).encode('utf-8')
+
+			self.send_response(200)
+			self.send_header("Content-Type", "application/json")
+			self.send_header("Content-Length", str(len(body)))
+			self.end_headers()
+			self.wfile.write(body)
+
+	server = HTTPServer(("localhost", port), Handler)
+	print("serving weather history on http://localhost:{}/api".format(port))
+	server.serve_forever()
+
+def provider(name):
+	"""provider from a command line name: wunderground, climate, a normals .json file for the climate provider,
+	a directory of cached days or a base url for the history API"""
+
+	if name == "wunderground":
+		return WundergroundProvider()
+	elif name == "climate":
+		return ClimateProvider()
+	elif name.startswith("http://") or name.startswith("https://"):
+		return WundergroundProvider(baseUrl=name)
+	elif os.path.isdir(name):
+		return FileProvider(name)
+	elif name.endswith(".json"):
+		return ClimateProvider(name)
+
+	raise Exception("error: unknown weather provider \"{}\"".format(name))
+
+if __name__ == "__main__":
+
+	import argparse
+
+	parser = argparse.ArgumentParser()
+	parser.add_argument("command", help="serve or prefetch", type=str)
+	parser.add_argument("--provider", help="wunderground, climate, a normals .json file, a directory of cached days or a history api url", default="climate", type=str)
+	parser.add_argument("--port", help="port to serve on", default=8080, type=int)
+	parser.add_argument("--year", help="year to prefetch", default=2015, type=int)
+	parser.add_argument("--days", help="number of days to prefetch", default=365, type=int)
+	args = parser.parse_args()
+
+	if args.command == "serve":
+		serve(provider(args.provider), args.port)
+	elif args.command == "prefetch":
+		print("fetched {} days".format(prefetch(provider(args.provider), datetime(args.year, 1, 1), args.days)))
+	else:
+		raise Exception("error: unknown command \"{}\"".format(args.command))
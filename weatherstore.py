@@ -0,0 +1,197 @@
+"""
+	weather store
+
+	Ingests the cached wunderground history files (weather/weather_YYYYMMDD.json)
+	once into a columnar NumPy .npz file and serves daily temperatures and
+	observation lookups by timestamp from sorted arrays, so simulations never
+	parse JSON or scan observation lists in their inner loops.
+
+	Observation times are the local "date" fields of the history files as naive
+	datetimes, which is what weatherGetConditions has always compared against.
+"""
+from datetime import datetime
+import glob
+import json
+import os.path
+import tempfile
+import numpy as np
+
+def dayKey(date):
+	return int(date.strftime("%Y%m%d"))
+
+def epochSeconds(date):
+	return int((date - datetime(1970, 1, 1)).total_seconds())
+
+def parseTemperature(value):
+	try:
+		value = float(value)
+	except (TypeError, ValueError):
+		return np.nan
+
+	"wunderground marks missing readings with -999 or -9999"
+	return np.nan if value <= -999 else value
+
+class WeatherStore(object):
+
+	columns = ["days", "minTemp", "maxTemp", "meanTemp", "times", "codes", "temperatures", "names"]
+
+	def __init__(self, directory="weather", filename=None):
+		object.__init__(self)
+
+		self.directory = directory
+		self.filename = filename or os.path.join(directory, "weather.npz")
+
+		if os.path.isfile(self.filename):
+			with np.load(self.filename) as data:
+				for column in self.columns:
+					setattr(self, column, data[column])
+		else:
+			self.days = np.zeros(0, dtype=np.int64)
+			self.minTemp = self.maxTemp = self.meanTemp = np.zeros(0)
+			self.times = np.zeros(0, dtype=np.int64)
+			self.codes = np.zeros(0, dtype=np.int16)
+			self.temperatures = np.zeros(0)
+			self.names = np.zeros(0, dtype=str)
+
+		self.ingest()
+
+	def ingest(self):
+		"add every cached history file that is not in the store yet.  returns the number of days added"
+
+		known = set(self.days.tolist())
+		files = []
+
+		for filename in sorted(glob.glob(os.path.join(self.directory, "weather_*.json"))):
+			key = int(os.path.basename(filename)[8:16])
+			if key not in known:
+				files.append((key, filename))
+
+		if not files:
+			return 0
+
+		names = self.names.tolist()
+		days, minTemp, maxTemp, meanTemp = [self.days.tolist(), self.minTemp.tolist(), self.maxTemp.tolist(), self.meanTemp.tolist()]
+		times, codes, temperatures = [self.times.tolist(), self.codes.tolist(), self.temperatures.tolist()]
+
+		for key, filename in files:
+			with open(filename, "r") as f:
+				w = json.loads(f.read())
+
+			dailySummary = w["history"]["dailysummary"][0]
+			days.append(key)
+			minTemp.append(parseTemperature(dailySummary["mintempm"]))
+			maxTemp.append(parseTemperature(dailySummary["maxtempm"]))
+			meanTemp.append(parseTemperature(dailySummary["meantempm"]))
+
+			for observation in w["history"]["observations"]:
+				d = observation["date"]
+				times.append(epochSeconds(datetime(int(d["year"]), int(d["mon"]), int(d["mday"]), int(d["hour"]), int(d["min"]))))
+
+				condition = observation.get("conds") or ""
+				if condition not in names:
+					names.append(condition)
+				codes.append(names.index(condition))
+
+				temperatures.append(parseTemperature(observation.get("tempm")))
+
+		"keep both tables sorted; the stable sort keeps the first of several observations in the same minute first"
+		order = np.argsort(days, kind="stable")
+		self.days = np.array(days, dtype=np.int64)[order]
+		self.minTemp = np.array(minTemp)[order]
+		self.maxTemp = np.array(maxTemp)[order]
+		self.meanTemp = np.array(meanTemp)[order]
+
+		order = np.argsort(times, kind="stable")
+		self.times = np.array(times, dtype=np.int64)[order]
+		self.codes = np.array(codes, dtype=np.int16)[order]
+		self.temperatures = np.array(temperatures)[order]
+		self.names = np.array(names, dtype=str)
+
+		self.save()
+
+		return len(files)
+
+	def save(self):
+		"through a file of this process's own, renamed over the store, so concurrent writers never mix their data"
+		directory = os.path.dirname(self.filename)
+
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+
+		with tempfile.NamedTemporaryFile(dir=directory or ".", suffix=".partial.npz", delete=False) as partial:
+			np.savez(partial, **dict((column, getattr(self, column)) for column in self.columns))
+
+		os.replace(partial.name, self.filename)
+
+	def hasDay(self, date):
+		i = np.searchsorted(self.days, dayKey(date))
+		return i < len(self.days) and self.days[i] == dayKey(date)
+
+	def daily(self, date):
+		"(min, max, mean) temperature of the day"
+		i = np.searchsorted(self.days, dayKey(date))
+
+		if i == len(self.days) or self.days[i] != dayKey(date):
+			raise KeyError("no weather for {}".format(date.date()))
+
+		return self.minTemp[i], self.maxTemp[i], self.meanTemp[i]
+
+	def conditionAt(self, date):
+		"weather condition reported in the minute of date, or None when there is no observation in that minute"
+		minute = epochSeconds(date.replace(second=0, microsecond=0))
+		i = np.searchsorted(self.times, minute)
+
+		if i < len(self.times) and self.times[i] == minute:
+			return self.names[self.codes[i]]
+
+		return None
+
+	def conditionsByMinute(self, date):
+		"the condition reported in every minute of the day starting at date (None where nothing was observed)"
+		start = epochSeconds(datetime(date.year, date.month, date.day))
+		first, last = np.searchsorted(self.times, [start, start + 86400])
+
+		conditions = [None] * 1440
+		minutes = (self.times[first:last] - start) // 60
+
+		"walk backwards so the first observation of a minute wins, like weatherGetConditions"
+		for minute, code in zip(minutes[::-1].tolist(), self.codes[first:last][::-1].tolist()):
+			conditions[minute] = str(self.names[code])
+
+		return conditions
+
+	def observationsBetween(self, start, end):
+		"observation times (unix seconds), temperatures and conditions between two datetimes"
+		first, last = np.searchsorted(self.times, [epochSeconds(start), epochSeconds(end)])
+
+		return self.times[first:last], self.temperatures[first:last], self.names[self.codes[first:last]]
+
+class WeatherCursor(object):
+	"forward only condition lookup for a simulation walking through time in order"
+
+	def __init__(self, store):
+		object.__init__(self)
+		self.store = store
+		self.position = 0
+
+	def conditionAt(self, date):
+		minute = epochSeconds(date.replace(second=0, microsecond=0))
+		times = self.store.times
+
+		while self.position < len(times) and times[self.position] < minute:
+			self.position += 1
+
+		if self.position < len(times) and times[self.position] == minute:
+			return self.store.names[self.store.codes[self.position]]
+
+		return None
+
+_stores = {}
+
+def weatherStore(directory="weather"):
+	"shared WeatherStore for a cache directory"
+
+	if directory not in _stores:
+		_stores[directory] = WeatherStore(directory)
+
+	return _stores[directory]
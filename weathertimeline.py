@@ -0,0 +1,94 @@
+"""
+	weather timeline
+
+	Outside air temperature and cloud attenuation for a whole run, computed
+	once from a WeatherStore.  Temperatures are interpolated between
+	observations and conditions are mapped to radiation coefficients ahead of
+	time, so a simulation only has to index arrays.
+"""
+from datetime import datetime, timedelta
+import numpy as np
+
+from weatherstore import epochSeconds
+
+class WeatherTimeline(object):
+	"""weather every 'resolution' seconds from start for 'seconds' seconds.
+	coefficient(condition) maps a condition to the fraction of direct radiation that gets through"""
+
+	def __init__(self, store, start, seconds, coefficient, resolution=60):
+		object.__init__(self)
+
+		self.start = start
+		self.resolution = resolution
+
+		times = epochSeconds(start) + np.arange(0, seconds, resolution, dtype=np.int64)
+
+		"a day of margin on each side so the ends interpolate from real observations"
+		obsTimes, temperatures, conditions = store.observationsBetween(start - timedelta(days = 1), start + timedelta(seconds = seconds, days = 1))
+
+		valid = ~np.isnan(temperatures)
+
+		if valid.any():
+			self.checkCoverage(obsTimes[valid], times)
+			self.outsideAirTemp = np.interp(times, obsTimes[valid], temperatures[valid])
+		else:
+			self.outsideAirTemp = self.dailyAnchors(store, start, seconds, times)
+
+		"a condition holds until the next observation that reports one; clear before the first"
+		reported = conditions != ""
+		obsTimes = obsTimes[reported]
+		conditions = conditions[reported]
+
+		names, codes = np.unique(conditions, return_inverse=True)
+		coefficients = np.append(np.array([coefficient(name) for name in names], dtype=float), 1.0)
+		names = np.append(names, "Clear")
+
+		index = np.searchsorted(obsTimes, times, side="right") - 1
+		index = np.where(index < 0, len(names) - 1, codes[np.maximum(index, 0)] if len(codes) else len(names) - 1)
+
+		self.attenuation = coefficients[index]
+		self.names = names
+		self.codes = index
+
+	def dailyAnchors(self, store, start, seconds, times):
+		"without temperature observations, pass through each day's min at 5am and max at 3pm"
+		anchorTimes = []
+		anchorTemps = []
+
+		for day in range(-1, int(seconds // 86400) + 2):
+			date = start + timedelta(days = day)
+			if not store.hasDay(date):
+				continue
+
+			minTemp, maxTemp, meanTemp = store.daily(date)
+			midnight = epochSeconds(date.replace(hour=0, minute=0, second=0, microsecond=0))
+			anchorTimes += [midnight + 5 * 3600, midnight + 15 * 3600]
+			anchorTemps += [minTemp, maxTemp]
+
+		if not anchorTimes:
+			raise Exception("error: no weather for {} to {}; fetch it into the weather store first".format(start.date(), (start + timedelta(seconds = seconds)).date()))
+
+		self.checkCoverage(np.array(anchorTimes), times)
+
+		return np.interp(times, anchorTimes, anchorTemps)
+
+	def checkCoverage(self, anchorTimes, times):
+		"""raise if the run has more than a day without an anchor (an observation or a daily min or max), at its ends
+		included, rather than interpolate a straight line across the missing days"""
+
+		points = np.sort(anchorTimes)
+		points = np.concatenate([[min(times[0], points[0])], points, [max(times[-1], points[-1])]])
+		gaps = np.flatnonzero(np.diff(points) > 86400)
+
+		if len(gaps):
+			first, last = (datetime(1970, 1, 1) + timedelta(seconds = int(points[i])) for i in (gaps[0], gaps[0] + 1))
+			raise Exception("error: no weather between {} and {}; fetch the missing days into the weather store first".format(first, last))
+
+	def window(self, date, seconds, step=1):
+		"""outside air temperature, attenuation and condition every step seconds for seconds from date,
+		held constant within each timeline sample"""
+
+		first = int((date - self.start).total_seconds())
+		index = (first + np.arange(0, seconds, step)) // self.resolution
+
+		return self.outsideAirTemp[index], self.attenuation[index], self.names[self.codes[index]]